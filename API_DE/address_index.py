@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+
+# Per-address row index over the cleaned transfer records.
+# Every transfer is listed under its sender and its receiver; the (address, row)
+# pairs are sorted by address and then by time, so one address's transfers are a
+# single contiguous range that is found with a dictionary lookup.
+
+ADDRESS_COLUMNS = ['from.hash', 'to.hash']
+
+
+def build_address_rows(df):
+    frames = []
+    for column in ADDRESS_COLUMNS:
+        frames.append(pd.DataFrame({
+            'address': df[column].str.lower().to_numpy(dtype=object),
+            'timestamp': df['timestamp'].to_numpy(),
+            'row': np.arange(len(df), dtype=np.int64),
+        }))
+    pairs = pd.concat(frames, ignore_index=True).dropna(subset=['address'])
+    # A self-transfer lists the same row twice under one address; keep it once
+    pairs = pairs.drop_duplicates(subset=['address', 'row'])
+    pairs = pairs.sort_values(['address', 'timestamp', 'row'], kind='stable')
+    return pairs[['address', 'row']].reset_index(drop=True)
+
+
+TRANSFER_KINDS = {'token_minting': 1, 'token_burning': 2, 'token_transfer': 3}
+
+
+class AddressIndex:
+    def __init__(self, cleaned, address_rows):
+        self.rows = address_rows['row'].to_numpy()
+        addresses = address_rows['address'].to_numpy(dtype=object)
+        self.ranges = {}
+        if len(addresses):
+            starts = np.flatnonzero(np.r_[True, addresses[1:] != addresses[:-1]])
+            ends = np.r_[starts[1:], len(addresses)]
+            self.ranges = {addresses[lo]: (lo, hi) for lo, hi in zip(starts, ends)}
+
+        # Column arrays prepared once, so a request only touches its own rows with numpy
+        self.record_columns = list(cleaned.columns)
+        self.columns = {col: cleaned[col].to_numpy() for col in self.record_columns}
+        self.from_lower = cleaned['from.hash'].str.lower().to_numpy(dtype=object)
+        self.to_lower = cleaned['to.hash'].str.lower().to_numpy(dtype=object)
+        self.token_codes, self.token_names = pd.factorize(cleaned['token.symbol'])
+        self.kind = cleaned['type'].map(TRANSFER_KINDS).fillna(0).to_numpy(dtype=np.int8)
+        self.value = cleaned['normalized_value'].to_numpy(dtype=float)
+
+    @classmethod
+    def from_frame(cls, cleaned):
+        return cls(cleaned, build_address_rows(cleaned))
+
+    def __contains__(self, address):
+        return address.lower() in self.ranges
+
+    def row_ids(self, address):
+        lo, hi = self.ranges.get(address.lower(), (0, 0))
+        return self.rows[lo:hi]
+
+    def _records(self, ids):
+        columns = {}
+        for col in self.record_columns:
+            values = self.columns[col][ids]
+            if values.dtype.kind == 'M':
+                values = np.where(np.isnat(values), None, np.datetime_as_string(values, unit='s'))
+            values = values.tolist()
+            if values and isinstance(values[0], float):
+                values = [None if v != v else v for v in values]
+            columns[col] = values
+        return [dict(zip(self.record_columns, row)) for row in zip(*columns.values())]
+
+    def transfers(self, address, limit=50, offset=0, newest_first=True):
+        ids = self.row_ids(address)
+        if newest_first:
+            ids = ids[::-1]
+        next_offset = offset + limit if offset + limit < len(ids) else None
+        return {"address": address, "total": len(ids), "offset": offset, "next_offset": next_offset,
+                "items": self._records(ids[offset:offset + limit])}
+
+    def balances(self, address):
+        # Same rules as analyze_holdings: minted + received - burned - sent, per token
+        ids = self.row_ids(address)
+        address = address.lower()
+        is_from = self.from_lower[ids] == address
+        is_to = self.to_lower[ids] == address
+        kind = self.kind[ids]
+        value = self.value[ids]
+        tokens, slot = np.unique(self.token_codes[ids], return_inverse=True)
+        parts = {
+            'minted': is_to & (kind == 1),
+            'burned': is_from & (kind == 2),
+            'received': is_to & (kind == 3),
+            'sent': is_from & (kind == 3),
+        }
+        sums = {name: np.bincount(slot, weights=np.where(mask, value, 0.0), minlength=len(tokens))
+                for name, mask in parts.items()}
+        balance = sums['minted'] - sums['burned'] + sums['received'] - sums['sent']
+        result = []
+        for i, code in enumerate(tokens):
+            entry = {'token': self.token_names[code] if code >= 0 else None}
+            entry.update({name: float(sums[name][i]) for name in parts})
+            entry['balance'] = float(balance[i])
+            result.append(entry)
+        return {"address": address, "balances": result}
+
+    def counterparties(self, address, limit=20):
+        ids = self.row_ids(address)
+        address = address.lower()
+        senders = self.from_lower[ids]
+        other = np.where(senders == address, self.to_lower[ids], senders)
+        totals = {}
+        for counterparty, value in zip(other.tolist(), self.value[ids].tolist()):
+            count, volume = totals.get(counterparty, (0, 0.0))
+            totals[counterparty] = (count + 1, volume + value)
+        ranked = sorted(totals.items(), key=lambda item: (item[1][0], item[1][1]), reverse=True)[:limit]
+        return {"address": address, "counterparties": [
+            {"counterparty": c, "transfers": n, "volume": v} for c, (n, v) in ranked]}
@@ -0,0 +1,91 @@
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+import pandas as pd
+
+# Load-test harness for address_service.py: N concurrent clients, each on its own
+# keep-alive connection, hitting random addresses; reports latency percentiles.
+#
+#   python address_loadtest.py --url http://127.0.0.1:8502 --clients 16 --requests 500
+
+SCENARIOS = ["balances", "transfers", "counterparties", "batch"]
+
+
+def _request(conn, method, path, body=None):
+    headers = {"Content-Type": "application/json"} if body is not None else {}
+    conn.request(method, path, body=body, headers=headers)
+    response = conn.getresponse()
+    response.read()
+    return response.status
+
+
+def run_client(url, addresses, requests_per_client, batch_size, results, seed):
+    rng = random.Random(seed)
+    parsed = urlparse(url)
+    conn = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=30)
+    for _ in range(requests_per_client):
+        scenario = rng.choice(SCENARIOS)
+        if scenario == "batch":
+            body = json.dumps({"addresses": rng.sample(addresses, min(batch_size, len(addresses))),
+                               "views": ["balances"]}).encode()
+            args = ("POST", "/batch", body)
+        else:
+            args = ("GET", f"/address/{rng.choice(addresses)}/{scenario}", None)
+        start = time.perf_counter()
+        try:
+            status = _request(conn, *args)
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=30)
+            status = 0
+        results.append((scenario, time.perf_counter() - start, status))
+    conn.close()
+
+
+def load_test(url, clients=8, requests_per_client=200, batch_size=20):
+    parsed = urlparse(url)
+    conn = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=30)
+    conn.request("GET", "/addresses?limit=1000")
+    addresses = json.loads(conn.getresponse().read())["addresses"]
+    conn.close()
+
+    results = []
+    threads = [threading.Thread(target=run_client, args=(url, addresses, requests_per_client, batch_size, results, i))
+               for i in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    df = pd.DataFrame(results, columns=["scenario", "seconds", "status"])
+    summary = df.groupby("scenario")["seconds"].describe(percentiles=[0.5, 0.99])[["count", "50%", "99%", "max"]]
+    summary.loc["all"] = [len(df), df["seconds"].quantile(0.5), df["seconds"].quantile(0.99), df["seconds"].max()]
+    summary[["50%", "99%", "max"]] *= 1000
+    summary.columns = ["requests", "p50_ms", "p99_ms", "max_ms"]
+    summary["errors"] = df.assign(err=df["status"] != 200).groupby("scenario")["err"].sum()
+    summary.loc["all", "errors"] = int((df["status"] != 200).sum())
+    return summary.round(2), len(df) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load test for the address query service.")
+    parser.add_argument("--url", default="http://127.0.0.1:8502")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per client")
+    parser.add_argument("--batch-size", type=int, default=20, help="Addresses per /batch request")
+    args = parser.parse_args()
+
+    summary, throughput = load_test(args.url, args.clients, args.requests, args.batch_size)
+    print(summary.to_string())
+    print(f"\n {throughput:,.0f} requests/s with {args.clients} concurrent clients")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import argparse
+import json
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from address_index import AddressIndex
+from snapshot import SNAPSHOT_DIR, ensure_snapshot, read_mapped
+
+# Local read-only query service over the pipeline output.
+#
+#   GET  /health
+#   GET  /addresses?limit=N                      sample of indexed addresses
+#   GET  /address/<addr>/balances                per-token balance
+#   GET  /address/<addr>/transfers?limit=&offset=&order=desc|asc
+#   GET  /address/<addr>/counterparties?limit=
+#   POST /batch  {"addresses": [...], "views": ["balances", "counterparties", "transfers"]}
+#
+#   python address_service.py --port 8502
+
+EXCEL_PATH = "DE_Assesment_Results.xlsx"
+MAX_PAGE_SIZE = 500
+MAX_BATCH = 1000
+VIEWS = ("balances", "transfers", "counterparties")
+
+
+def load_index(excel_path=EXCEL_PATH, snapshot_dir=SNAPSHOT_DIR, history_path=None):
+    # The accumulated history (pipeline.py --incremental) wins over the workbook snapshot
+    if history_path and os.path.exists(history_path):
+        return AddressIndex.from_frame(read_mapped(history_path))
+    snap = ensure_snapshot(excel_path, snapshot_dir)
+    return AddressIndex(snap["cleaned"], snap["address_rows"])
+
+
+def _int_param(query, name, default, upper=None):
+    value = int(query.get(name, [default])[0])
+    return min(max(value, 0), upper) if upper else max(value, 0)
+
+
+def run_view(index, address, view, query=None):
+    query = query or {}
+    if view == "balances":
+        return index.balances(address)
+    if view == "transfers":
+        return index.transfers(address,
+                               limit=_int_param(query, "limit", 50, MAX_PAGE_SIZE),
+                               offset=_int_param(query, "offset", 0),
+                               newest_first=query.get("order", ["desc"])[0] != "asc")
+    if view == "counterparties":
+        return index.counterparties(address, limit=_int_param(query, "limit", 20, MAX_PAGE_SIZE))
+    raise KeyError(view)
+
+
+def make_handler(index):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive for clients that reuse connections
+        disable_nagle_algorithm = True  # headers and body go out in separate writes
+
+        def _send(self, status, payload):
+            body = json.dumps(payload, default=str).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            parts = [p for p in url.path.split("/") if p]
+            try:
+                if parts == ["health"]:
+                    return self._send(200, {"status": "ok", "addresses": len(index.ranges)})
+                if parts == ["addresses"]:
+                    limit = _int_param(query, "limit", 100, MAX_BATCH)
+                    return self._send(200, {"addresses": list(index.ranges)[:limit]})
+                if len(parts) == 3 and parts[0] == "address" and parts[2] in VIEWS:
+                    if parts[1] not in index:
+                        return self._send(404, {"error": f"unknown address {parts[1]}"})
+                    return self._send(200, run_view(index, parts[1], parts[2], query))
+            except ValueError as e:
+                return self._send(400, {"error": str(e)})
+            self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            if urlparse(self.path).path != "/batch":
+                return self._send(404, {"error": "not found"})
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                addresses = request.get("addresses", [])
+                views = request.get("views", ["balances"])
+            except (ValueError, AttributeError) as e:
+                return self._send(400, {"error": f"bad request body: {e}"})
+            # Addresses are JSON object keys in the reply and index lookups: strings only
+            if not isinstance(addresses, list) or not all(isinstance(a, str) for a in addresses):
+                return self._send(400, {"error": "addresses must be a list of strings"})
+            if not isinstance(views, list) or not all(isinstance(v, str) for v in views):
+                return self._send(400, {"error": "views must be a list of strings"})
+            addresses = addresses[:MAX_BATCH]
+            views = [v for v in views if v in VIEWS]
+            results = {}
+            for address in addresses:
+                if address not in index:
+                    results[address] = None
+                    continue
+                results[address] = {view: run_view(index, address, view) for view in views}
+            self._send(200, {"results": results})
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def serve(index, port=8502, host="127.0.0.1"):
+    return ThreadingHTTPServer((host, port), make_handler(index))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve per-address balances and transfer history over HTTP.")
+    parser.add_argument("--excel", default=EXCEL_PATH)
+    parser.add_argument("--snapshot-dir", default=SNAPSHOT_DIR)
+    parser.add_argument("--history", default=None, help="Use the incremental history file instead of the workbook")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8502)
+    args = parser.parse_args()
+
+    index = load_index(args.excel, args.snapshot_dir, args.history)
+    server = serve(index, args.port, args.host)
+    print(f" Serving {len(index.ranges)} addresses on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
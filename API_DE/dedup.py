@@ -0,0 +1,162 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# Persistent dedup index shared by all ingestion runs.
+# A transfer is identified by transaction_hash + log_index, reduced to a 64-bit
+# fingerprint. Lookups go through a Bloom filter first (a definite "new" costs a
+# few bit probes); only Bloom hits are checked against the exact fingerprint set,
+# which is stored on disk as sorted runs searched with binary search.
+# New batches are appended as one more run. Runs are merged size-tiered: only
+# TIER_FANOUT runs of the same size class are merged at a time, so each
+# fingerprint is rewritten O(log n) times overall and the cost of an ingest
+# follows the batch size, not the size of the history.
+
+DEDUP_DIR = "dedup_index"
+IDENTITY_FIELDS = ['transaction_hash', 'log_index']
+# Fixed 16-byte key so fingerprints stay identical between processes and runs
+FINGERPRINT_KEY = "xcap-transfer-id"
+BLOOM_CAPACITY = 1_000_000
+BLOOM_HASHES = 7  # ~1% false positives at capacity (10 bits per entry)
+TIER_FANOUT = 4  # runs of one size class (powers of 4) merged together
+
+
+def transfer_fingerprints(df):
+    # Older extracts have no log_index; fall back to the whole-row identity used before
+    if all(col in df.columns for col in IDENTITY_FIELDS):
+        keys = df['transaction_hash'].astype(str) + ":" + df['log_index'].astype(str)
+    else:
+        keys = df.astype(str).agg("|".join, axis=1)
+    return pd.util.hash_array(keys.to_numpy(dtype=object), hash_key=FINGERPRINT_KEY)
+
+
+class DedupIndex:
+    def __init__(self, path=DEDUP_DIR):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                self.meta = json.load(f)
+        else:
+            self.meta = {"count": 0, "capacity": BLOOM_CAPACITY, "runs": [], "next_run": 0}
+        self.runs = [np.load(os.path.join(path, name), mmap_mode="r") for name in self.meta["runs"]]
+        bloom_path = os.path.join(path, "bloom.npy")
+        self.bloom = np.load(bloom_path) if os.path.exists(bloom_path) else self._empty_bloom()
+
+    # --- Bloom filter -------------------------------------------------------
+    def _empty_bloom(self):
+        return np.zeros(self.meta["capacity"] * 10 // 8 + 1, dtype=np.uint8)
+
+    def _bit_positions(self, fingerprints):
+        # Double hashing: position_i = h1 + i * h2 (mod m), derived from the 64-bit fingerprint
+        nbits = np.uint64(len(self.bloom) * 8)
+        h1 = fingerprints & np.uint64(0xFFFFFFFF)
+        h2 = (fingerprints >> np.uint64(32)) | np.uint64(1)
+        steps = np.arange(BLOOM_HASHES, dtype=np.uint64)
+        return (h1[:, None] + steps[None, :] * h2[:, None]) % nbits
+
+    def _bloom_contains(self, fingerprints):
+        bits = self._bit_positions(fingerprints)
+        present = (self.bloom[bits >> np.uint64(3)] >> (bits & np.uint64(7)).astype(np.uint8)) & 1
+        return present.all(axis=1)
+
+    def _bloom_add(self, fingerprints):
+        bits = self._bit_positions(fingerprints).ravel()
+        np.bitwise_or.at(self.bloom, bits >> np.uint64(3), (1 << (bits & np.uint64(7))).astype(np.uint8))
+
+    # --- Exact set ----------------------------------------------------------
+    def _exact_contains(self, fingerprints):
+        found = np.zeros(len(fingerprints), dtype=bool)
+        for run in self.runs:
+            pos = np.searchsorted(run, fingerprints)
+            hit = pos < len(run)
+            found[hit] |= run[pos[hit]] == fingerprints[hit]
+        return found
+
+    def _replace_file(self, name, write):
+        # Write to a temp file and rename, so a crash never leaves a torn file
+        tmp_path = os.path.join(self.path, name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            write(f)
+        os.replace(tmp_path, os.path.join(self.path, name))
+
+    def _save(self):
+        self._replace_file("bloom.npy", lambda f: np.save(f, self.bloom))
+        self._replace_file("meta.json", lambda f: f.write(json.dumps(self.meta, indent=2).encode()))
+
+    def _write_run(self, fingerprints):
+        # The file is only referenced once meta.json is saved; until then it is unused
+        name = f"run_{self.meta['next_run']:06d}.npy"
+        self._replace_file(name, lambda f: np.save(f, np.sort(fingerprints)))
+        self.meta["next_run"] += 1
+        self.meta["runs"].append(name)
+        self.runs.append(np.load(os.path.join(self.path, name), mmap_mode="r"))
+
+    def _compact(self):
+        # Merge TIER_FANOUT runs of the same size class, smallest class first, until no
+        # class has that many. Returns the run files that are no longer referenced.
+        obsolete = []
+        while True:
+            tiers = {}
+            for i, run in enumerate(self.runs):
+                tiers.setdefault(int(np.log(max(len(run), 1)) / np.log(TIER_FANOUT)), []).append(i)
+            group = next((members for _, members in sorted(tiers.items()) if len(members) >= TIER_FANOUT), None)
+            if group is None:
+                return obsolete
+            group = group[:TIER_FANOUT]
+            merged = np.concatenate([np.asarray(self.runs[i]) for i in group])
+            obsolete += [self.meta["runs"][i] for i in group]
+            self.meta["runs"] = [name for i, name in enumerate(self.meta["runs"]) if i not in group]
+            self.runs = [run for i, run in enumerate(self.runs) if i not in group]
+            self._write_run(merged)
+
+    def _grow_bloom(self, needed):
+        # Rebuild at double capacity from the exact set so the false-positive rate stays bounded
+        while self.meta["capacity"] < needed:
+            self.meta["capacity"] *= 2
+        self.bloom = self._empty_bloom()
+        for run in self.runs:
+            self._bloom_add(np.asarray(run))
+
+    # --- Public API -----------------------------------------------------------
+    def filter_new(self, df):
+        # Returns (rows never seen before, their fingerprints, stats); nothing is recorded yet
+        fingerprints = transfer_fingerprints(df)
+        first_in_batch = ~pd.Series(fingerprints).duplicated().to_numpy()
+
+        maybe_seen = self._bloom_contains(fingerprints)
+        seen = np.zeros(len(df), dtype=bool)
+        candidates = maybe_seen & first_in_batch
+        seen[candidates] = self._exact_contains(fingerprints[candidates])
+
+        keep = first_in_batch & ~seen
+        stats = {
+            "batch_rows": len(df),
+            "in_batch_duplicates": int((~first_in_batch).sum()),
+            "historical_duplicates": int(seen.sum()),
+            "new_rows": int(keep.sum()),
+            "bloom_checks_skipped": int((first_in_batch & ~maybe_seen).sum()),
+            "bloom_false_positives": int((candidates & ~seen).sum()),
+            "indexed_before": self.meta["count"],
+        }
+        stats["duplicate_rate"] = round(1 - stats["new_rows"] / len(df), 4) if len(df) else 0.0
+        return df[keep], fingerprints[keep], stats
+
+    def add(self, fingerprints):
+        # Record fingerprints returned by filter_new, once their rows are safely stored
+        if len(fingerprints) == 0:
+            return
+        self._write_run(fingerprints)
+        self.meta["count"] += len(fingerprints)
+        obsolete = self._compact()
+        if self.meta["count"] > self.meta["capacity"]:
+            self._grow_bloom(self.meta["count"])
+        else:
+            self._bloom_add(fingerprints)
+        self._save()
+        # Old runs go only after meta.json stops referring to them
+        for name in obsolete:
+            os.remove(os.path.join(self.path, name))
@@ -0,0 +1,195 @@
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows: no getrusage, peak RSS is not recorded
+    resource = None
+
+# Per-stage and per-page instrumentation for the ETL pipeline.
+# Each stage records wall time, CPU time, rows in/out and the process's peak RSS;
+# the fetch stage also records every page request. tracemalloc (peak traced
+# memory per stage) is opt-in: it slows allocation-heavy pandas code several
+# times over, so runs with trace_memory=True are not comparable on time.
+# Stages running concurrently on worker threads record their own thread's CPU
+# time and no memory peak (both are process-wide); the stage wrapping them does.
+# A run can be exposed as Prometheus text, written as a JSON run log and
+# compared against the previous run.
+
+RUN_LOG_DIR = "run_logs"
+
+
+def peak_rss_bytes():
+    # High-water mark of the process's resident memory (never decreases)
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # kilobytes on Linux
+
+
+def count_rows(obj):
+    # DataFrames count their rows; tuples of frames (e.g. analyze_trends) are summed
+    if obj is None:
+        return None
+    if isinstance(obj, (tuple, list)):
+        return sum(count_rows(o) or 0 for o in obj)
+    return len(obj)
+
+
+class PipelineMetrics:
+    def __init__(self, run_id=None, trace_memory=False):
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.trace_memory = trace_memory
+        self.started_at = datetime.now(timezone.utc).isoformat()
+        self.stages = []
+        self.pages = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name, rows_in=None, concurrent=False):
+        # concurrent=True for a stage sharing the process with other running stages
+        record = {"stage": name, "rows_in": rows_in, "rows_out": None, "bytes_fetched": 0}
+        measure_memory = self.trace_memory and not concurrent
+        tracing = measure_memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        if measure_memory:
+            tracemalloc.reset_peak()
+        cpu_clock = time.thread_time if concurrent else time.process_time
+        wall_start = time.perf_counter()
+        cpu_start = cpu_clock()
+        try:
+            yield record
+        finally:
+            record["wall_seconds"] = time.perf_counter() - wall_start
+            record["cpu_seconds"] = cpu_clock() - cpu_start
+            if not concurrent:
+                record["peak_rss_bytes"] = peak_rss_bytes()
+            if measure_memory:
+                record["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+            if tracing:
+                tracemalloc.stop()
+            with self._lock:
+                self.stages.append(record)
+
+    def record_page(self, page, seconds, nbytes, items, status):
+        with self._lock:
+            self.pages.append({"page": page, "wall_seconds": seconds, "bytes": nbytes,
+                               "items": items, "status": status})
+
+    def to_dict(self):
+        with self._lock:
+            return {"run_id": self.run_id, "started_at": self.started_at, "trace_memory": self.trace_memory,
+                    "stages": list(self.stages), "pages": list(self.pages)}
+
+    def to_prometheus(self):
+        run = self.to_dict()
+        lines = []
+
+        def metric(name, help_text, kind, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{k}="{v}"' for k, v in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}")
+
+        stage_fields = [
+            ("pipeline_stage_wall_seconds", "wall_seconds", "Wall-clock time spent in the stage"),
+            ("pipeline_stage_cpu_seconds", "cpu_seconds", "CPU time spent in the stage (its own thread for concurrent stages)"),
+            ("pipeline_stage_rows_in", "rows_in", "Rows entering the stage"),
+            ("pipeline_stage_rows_out", "rows_out", "Rows produced by the stage"),
+            ("pipeline_stage_peak_rss_bytes", "peak_rss_bytes", "Process peak RSS at the end of the stage"),
+            ("pipeline_stage_peak_memory_bytes", "peak_memory_bytes", "Peak traced memory during the stage (--trace-memory)"),
+            ("pipeline_stage_bytes_fetched", "bytes_fetched", "Bytes downloaded by the stage"),
+            ("pipeline_stage_failed", "failed", "1 if the stage produced no usable output"),
+            ("pipeline_stage_duplicate_rate", "duplicate_rate", "Share of fetched rows dropped as duplicates"),
+            ("pipeline_stage_cache_hit", "cache_hit", "1 if the stage output was reused from the stage cache"),
+        ]
+        for name, field, help_text in stage_fields:
+            samples = [({"run_id": run["run_id"], "stage": s["stage"]}, s[field])
+                       for s in run["stages"] if s.get(field) is not None]
+            metric(name, help_text, "gauge", samples)
+
+        page_fields = [
+            ("pipeline_page_wall_seconds", "wall_seconds", "Time to fetch one API page"),
+            ("pipeline_page_bytes", "bytes", "Response size of one API page"),
+            ("pipeline_page_items", "items", "Items returned by one API page"),
+        ]
+        for name, field, help_text in page_fields:
+            samples = [({"run_id": run["run_id"], "page": p["page"], "status": p["status"]}, p[field])
+                       for p in run["pages"]]
+            metric(name, help_text, "gauge", samples)
+        return "\n".join(lines) + "\n"
+
+    def write_run_log(self, log_dir=RUN_LOG_DIR):
+        os.makedirs(log_dir, exist_ok=True)
+        path = os.path.join(log_dir, f"{self.started_at[:19].replace(':', '')}_{self.run_id}.json")
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        return path
+
+
+def load_run_logs(log_dir=RUN_LOG_DIR):
+    if not os.path.isdir(log_dir):
+        return []
+    runs = []
+    for name in sorted(os.listdir(log_dir)):
+        if name.endswith(".json"):
+            with open(os.path.join(log_dir, name)) as f:
+                runs.append(json.load(f))
+    return sorted(runs, key=lambda r: r["started_at"])
+
+
+def stage_table(run):
+    return pd.DataFrame(run["stages"]).set_index("stage")
+
+
+def compare_runs(previous, current):
+    # Side-by-side per-stage numbers with absolute and relative change
+    fields = ["wall_seconds", "cpu_seconds", "rows_in", "rows_out", "peak_rss_bytes", "bytes_fetched"]
+    # Older run logs may lack a field; it shows up as NaN instead of failing
+    prev = stage_table(previous).reindex(columns=fields)
+    curr = stage_table(current).reindex(columns=fields)
+    comparison = prev.join(curr, lsuffix="_prev", rsuffix="_curr", how="outer")
+    comparison = comparison.reindex(list(dict.fromkeys([*curr.index, *prev.index])))
+    for field in ["wall_seconds", "cpu_seconds", "peak_rss_bytes"]:
+        comparison[f"{field}_delta"] = comparison[f"{field}_curr"] - comparison[f"{field}_prev"]
+        comparison[f"{field}_change_%"] = (comparison[f"{field}_delta"] / comparison[f"{field}_prev"] * 100).round(1)
+    return comparison
+
+
+def serve_metrics(metrics, port=9108, host="0.0.0.0"):
+    # Background Prometheus endpoint: GET /metrics (text) and /metrics.json
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/metrics":
+                body = metrics.to_prometheus().encode()
+                content_type = "text/plain; version=0.0.4"
+            elif self.path == "/metrics.json":
+                body = json.dumps(metrics.to_dict()).encode()
+                content_type = "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
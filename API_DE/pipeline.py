@@ -0,0 +1,402 @@
+import argparse
+import os
+import sys
+import time
+from functools import reduce
+
+import pandas as pd
+import requests
+
+from instrumentation import PipelineMetrics, RUN_LOG_DIR, compare_runs, count_rows, load_run_logs, serve_metrics
+from report import write_report
+from dedup import DEDUP_DIR, DedupIndex
+from price_store import PRICE_STORE_PATH, PriceStore, read_price_csv, reprice
+from snapshot import SNAPSHOT_DIR, publish_sheets, read_mapped, write_arrow
+from stage_cache import STAGE_CACHE_DIR, Stage, StageCache, run_stages
+from supply_index import SupplyIndex
+from timebuckets import volume_buckets
+
+# Script version of the ETL in ETL_Pipeline_DE.ipynb / the live app:
+# fetch -> process_data -> calculate_metrics -> analyze_holdings -> analyze_trends
+
+# Constants
+EXCEL_PATH = "DE_Assesment_Results.xlsx"
+BASE_URL = "https://xcap-mainnet.explorer.xcap.network/api/v2/token-transfers"
+MAX_PAGES = 50
+PAGE_DELAY = 0.3
+FIELDS_TO_KEEP = [
+    'transaction_hash',
+    'token.symbol',
+    'total.value',
+    'from.hash',
+    'to.hash',
+    'timestamp',
+    'token.exchange_rate',
+    'type',
+    'token.decimals',
+    'log_index'
+]
+HISTORY_PATH = "history/cleaned.arrow"
+SUPPLY_INDEX_PATH = "history/supply_events.arrow"
+
+
+def fetch_all_token_transfers(metrics=None, stage=None):
+    page = 1
+    all_data = []
+
+    while page <= MAX_PAGES:
+        try:
+            start = time.perf_counter()
+            response = requests.get(BASE_URL, params={"page": page}, timeout=10)
+            elapsed = time.perf_counter() - start
+            nbytes = len(response.content)
+            if stage is not None:
+                stage["bytes_fetched"] += nbytes
+
+            if response.status_code != 200:
+                if metrics is not None:
+                    metrics.record_page(page, elapsed, nbytes, 0, response.status_code)
+                print(f" Error {response.status_code} on page {page}")
+                break
+
+            data = response.json()
+            items = data.get("items", [])
+            if metrics is not None:
+                metrics.record_page(page, elapsed, nbytes, len(items), response.status_code)
+
+            if not items:
+                break
+
+            all_data.extend(items)
+            page += 1
+            time.sleep(PAGE_DELAY)
+
+        except requests.exceptions.RequestException as e:
+            print(f" Request failed on page {page}: {e}")
+            break
+
+    if not all_data:
+        # API down or empty: keep the schema so callers can tell "no rows" from a crash
+        return pd.DataFrame(columns=FIELDS_TO_KEEP)
+    df = pd.json_normalize(all_data)
+    available_fields = [col for col in FIELDS_TO_KEEP if col in df.columns]
+    return df[available_fields]
+
+
+def process_data(df, prices=None):
+    # Clean and transform data
+    df = df.drop_duplicates(subset=[col for col in FIELDS_TO_KEEP if col in df.columns])
+    df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce').dt.tz_localize(None)
+
+    # Convert numeric fields
+    df['total.value'] = pd.to_numeric(df['total.value'], errors='coerce').fillna(0)
+    df['token.decimals'] = pd.to_numeric(df['token.decimals'], errors='coerce').fillna(18)
+    df['normalized_value'] = df['total.value'] / (10 ** df['token.decimals'])
+    df['token.exchange_rate'] = pd.to_numeric(df['token.exchange_rate'], errors='coerce').fillna(0)
+    # token.exchange_rate is the rate at fetch time; with a price store each
+    # transfer is valued at the rate as of its own timestamp instead
+    if prices is not None:
+        return reprice(df, prices)
+    df['usd_value'] = df['normalized_value'] * df['token.exchange_rate']
+
+    return df
+
+
+def calculate_metrics(df):
+    # Calculate key metrics
+    minted_total = df[df['type'] == 'token_minting']['normalized_value'].sum()
+    burned_total = df[df['type'] == 'token_burning']['normalized_value'].sum()
+
+    metrics = {
+        "Metric": [
+            "1. Total Asset Supply",
+            "2. Unique Tokens",
+            "3. Total Transactions",
+            "4. Tokens Minted",
+            "5. Tokens Burned",
+            "6. Tokens Transferred",
+            "7. Total Transaction Volume (USD)"
+        ],
+        "Value": [
+            minted_total - burned_total,
+            df['token.symbol'].nunique(),
+            len(df),
+            minted_total,
+            burned_total,
+            df[df['type'] == 'token_transfer']['normalized_value'].sum(),
+            df['usd_value'].sum()
+        ]
+    }
+
+    return pd.DataFrame(metrics)
+
+
+def analyze_holdings(df):
+    # Token holdings analysis
+    tokens_sent = df[df['type'] == 'token_transfer'].groupby('from.hash')['normalized_value'].sum().reset_index()
+    tokens_sent.columns = ['address', 'tokens_sent']
+
+    tokens_received = df[df['type'] == 'token_transfer'].groupby('to.hash')['normalized_value'].sum().reset_index()
+    tokens_received.columns = ['address', 'tokens_received']
+
+    tokens_minted = df[df['type'] == 'token_minting'].groupby('to.hash')['normalized_value'].sum().reset_index()
+    tokens_minted.columns = ['address', 'tokens_minted']
+
+    tokens_burned = df[df['type'] == 'token_burning'].groupby('from.hash')['normalized_value'].sum().reset_index()
+    tokens_burned.columns = ['address', 'tokens_burned']
+
+    # Combine all data
+    dfs = [tokens_minted, tokens_burned, tokens_received, tokens_sent]
+    df_combined = reduce(lambda left, right: pd.merge(left, right, on='address', how='outer'), dfs).fillna(0)
+    df_combined['token_holding'] = (df_combined['tokens_minted'] - df_combined['tokens_burned']) + \
+                                  (df_combined['tokens_received'] - df_combined['tokens_sent'])
+
+    # Calculate percentages
+    total_token_holding = df_combined['token_holding'].sum()
+    total_tokens_sent = df_combined['tokens_sent'].sum()
+    total_tokens_received = df_combined['tokens_received'].sum()
+
+    top10_holdings = df_combined.sort_values('token_holding', ascending=False).head(10)[['address', 'token_holding']]
+    top10_holdings['% of Total Holding'] = (top10_holdings['token_holding'] / total_token_holding * 100).round(2)
+
+    top10_sent = df_combined.sort_values('tokens_sent', ascending=False).head(10)[['address', 'tokens_sent']]
+    top10_sent['% of Total Sent'] = (top10_sent['tokens_sent'] / total_tokens_sent * 100).round(2)
+
+    top10_received = df_combined.sort_values('tokens_received', ascending=False).head(10)[['address', 'tokens_received']]
+    top10_received['% of Total Received'] = (top10_received['tokens_received'] / total_tokens_received * 100).round(2)
+
+    # Merge summaries
+    summary_report = pd.merge(top10_holdings, top10_sent, on='address', how='outer')
+    summary_report = pd.merge(summary_report, top10_received, on='address', how='outer')
+
+    return summary_report.rename(columns={
+        'token_holding': 'Token Holding',
+        'tokens_sent': 'Tokens Sent',
+        'tokens_received': 'Tokens Received'
+    })
+
+
+def analyze_trends(df):
+    # Daily volume
+    volume_per_day = df.groupby([df['timestamp'].dt.date, 'token.symbol'])['normalized_value'].sum().reset_index()
+    volume_per_day.columns = ['date', 'token', 'daily_volume']
+
+    # Cumulative supply
+    df_mint = df[df['type'] == 'token_minting'].copy()
+    df_burn = df[df['type'] == 'token_burning'].copy()
+
+    df_mint['minted'] = df_mint['normalized_value']
+    df_burn['burned'] = df_burn['normalized_value']
+
+    mint_burn = pd.concat([df_mint[['timestamp', 'token.symbol', 'minted']],
+                           df_burn[['timestamp', 'token.symbol', 'burned']]], sort=False).fillna(0)
+    mint_burn['date'] = mint_burn['timestamp'].dt.date
+
+    supply = mint_burn.groupby(['date', 'token.symbol']).agg({'minted': 'sum', 'burned': 'sum'}).reset_index()
+    supply['net_minted'] = supply['minted'] - supply['burned']
+    supply['cumulative_supply'] = supply.groupby('token.symbol')['net_minted'].cumsum()
+
+    # Top traded tokens
+    traded_volume = df[df['type'] == 'token_transfer'].groupby('token.symbol')['normalized_value'].sum().reset_index()
+    traded_volume.columns = ['token.symbol', 'total_transferred']
+    traded_volume = traded_volume.sort_values('total_transferred', ascending=False)
+
+    return volume_per_day, supply, traded_volume
+
+
+def analyze_spikes(df):
+    # Daily totals per token and transfer type (minting / burning / transfer)
+    spike_analysis = df.groupby([df['timestamp'].dt.date, 'token.symbol', 'type'])['normalized_value'].sum().reset_index()
+    spike_analysis = spike_analysis.pivot(index=['timestamp', 'token.symbol'], columns='type', values='normalized_value').fillna(0)
+    spike_analysis.reset_index(inplace=True)
+    spike_analysis.columns.name = None
+    return spike_analysis
+
+
+def clean_batch(batch, price_table):
+    # process_data as a cached stage: the batch is copied, the price table is an input artifact
+    return process_data(batch.copy(), PriceStore.from_frame(price_table))
+
+
+def report_sheets(results):
+    # Workbook layout read by the dashboards (sheet name -> frame)
+    return {
+        "task2_metrics_table": results["metrics"],
+        "Raw_fetched_records": results["raw"],
+        "Total_cleaned_records": results["cleaned"],
+        "task3_summary_report": results["summary"],
+        "task4_volume_per_day": results["trend"],
+        "task4_cumulative_supply": results["supply"],
+        "task4_spike_analysis": results["spikes"],
+        "task4_top_tokens": results["top"],
+    }
+
+
+def load_history(path=HISTORY_PATH):
+    return read_mapped(path) if os.path.exists(path) else None
+
+
+def load_supply_index(path=SUPPLY_INDEX_PATH):
+    return SupplyIndex.from_events(read_mapped(path)) if os.path.exists(path) else SupplyIndex()
+
+
+def run_pipeline(metrics=None, incremental=False, dedup_dir=DEDUP_DIR, history_path=HISTORY_PATH,
+                 supply_index_path=SUPPLY_INDEX_PATH, price_store_path=PRICE_STORE_PATH, price_backfill=None,
+                 stage_cache_dir=STAGE_CACHE_DIR, use_cache=True):
+    # incremental=True keeps the cleaned history between runs: each fetched batch is
+    # deduplicated against everything ingested before and appended to the history.
+    metrics = metrics or PipelineMetrics()
+
+    with metrics.stage("fetch") as stage:
+        raw_data = fetch_all_token_transfers(metrics, stage)
+        stage["rows_out"] = count_rows(raw_data)
+        stage["failed"] = int(raw_data.empty)
+    if raw_data.empty:
+        # Nothing to process; the failed fetch is in the run log, the history is untouched
+        print(" Fetch returned no items, stopping before processing")
+        return None
+
+    prices = PriceStore(price_store_path)
+    with metrics.stage("prices", rows_in=count_rows(raw_data)) as stage:
+        # Backfilled history (CSV) plus the rates observed in this fetch; price_changes
+        # counts new and corrected backfill points
+        price_changes = prices.add(read_price_csv(price_backfill)) if price_backfill else 0
+        prices.observe(raw_data)
+        prices.save()
+        stage["rows_out"] = len(prices)
+
+    batch = raw_data
+    if incremental:
+        index = DedupIndex(dedup_dir)
+        with metrics.stage("dedup", rows_in=count_rows(raw_data)) as stage:
+            batch, new_fingerprints, dedup_stats = index.filter_new(raw_data)
+            stage["rows_out"] = count_rows(batch)
+            stage["duplicate_rate"] = dedup_stats["duplicate_rate"]
+        print(f" Dedup: {dedup_stats['new_rows']} new of {dedup_stats['batch_rows']} fetched "
+              f"({dedup_stats['in_batch_duplicates']} repeated in batch, "
+              f"{dedup_stats['historical_duplicates']} seen in earlier runs, "
+              f"duplicate rate {dedup_stats['duplicate_rate']:.1%})")
+
+    # Everything below is a DAG of named stages over named artifacts. Cached stages
+    # are skipped when their code and inputs are unchanged (see stage_cache.py);
+    # independent ones (metrics, holdings, trends, ...) run concurrently.
+    def append_history(processed_data):
+        # Only the new batch's mint/burn events are added to the prefix sums
+        supply_index = load_supply_index(supply_index_path)
+        supply_index.extend(processed_data)
+        history = load_history(history_path)
+        if history is not None:
+            if price_changes:
+                # New historical rates re-price the stored rows in one as-of join, no refetch
+                history = reprice(history, prices)
+            processed_data = pd.concat([history, processed_data], ignore_index=True)
+        for path in (history_path, supply_index_path):
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        write_arrow(processed_data, history_path)
+        supply_events = supply_index.to_frame()
+        write_arrow(supply_events, supply_index_path)
+        # Only record fingerprints once their rows are stored
+        index.add(new_fingerprints)
+        return processed_data, supply_events
+
+    processed = "processed" if incremental else "cleaned"
+    stages = [Stage("process_data", clean_batch, ["batch", "prices"], [processed], row_inputs=["batch"])]
+    if incremental:
+        stages.append(Stage("history", append_history, ["processed"], ["cleaned", "supply_events"], cache=False))
+    stages += [
+        Stage("calculate_metrics", calculate_metrics, ["cleaned"], ["metrics"]),
+        Stage("analyze_holdings", analyze_holdings, ["cleaned"], ["summary"]),
+        Stage("analyze_trends", analyze_trends, ["cleaned"], ["trend", "supply", "top"]),
+        Stage("analyze_spikes", analyze_spikes, ["cleaned"], ["spikes"]),
+        Stage("volume_buckets", volume_buckets, ["cleaned"], ["buckets"]),
+    ]
+    artifacts = {"batch": batch, "prices": prices.prices}
+    cache = StageCache(stage_cache_dir) if use_cache else None
+    cache_report = run_stages(stages, artifacts, metrics, cache)
+    hits = [row["stage"] for row in cache_report if row["cache"] == "hit"]
+    print(f" Stage cache: {len(hits)} of {sum(s.cache for s in stages)} cacheable stages reused"
+          + (f" ({', '.join(hits)})" if hits else ""))
+
+    return {
+        "raw": raw_data,
+        "cleaned": artifacts["cleaned"],
+        "metrics": artifacts["metrics"],
+        "summary": artifacts["summary"],
+        "trend": artifacts["trend"],
+        "supply": artifacts["supply"],
+        "top": artifacts["top"],
+        "spikes": artifacts["spikes"],
+        "buckets": artifacts["buckets"],
+        # The persisted supply index (incremental runs only), for the snapshot
+        "supply_events": artifacts.get("supply_events"),
+        "stage_cache": pd.DataFrame(cache_report),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the token-transfer ETL with per-stage instrumentation.")
+    parser.add_argument("--log-dir", default=RUN_LOG_DIR, help="Directory for JSON run logs")
+    parser.add_argument("--excel", default=EXCEL_PATH, help="Workbook the dashboards read")
+    parser.add_argument("--no-raw", action="store_true", help="Leave the Raw_fetched_records sheet out of the report")
+    parser.add_argument("--raw-row-cap", type=int, default=None, help="Write at most this many raw rows")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Deduplicate against earlier runs and accumulate the cleaned history")
+    parser.add_argument("--price-backfill", default=None,
+                        help="CSV of historical rates (token.symbol, timestamp, rate) to add to the price store")
+    parser.add_argument("--snapshot-dir", default=SNAPSHOT_DIR, help="Snapshot the dashboards map (published with the report)")
+    parser.add_argument("--no-cache", action="store_true", help="Recompute every stage instead of reusing cached outputs")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Also record tracemalloc peaks per stage (slows the run; timings not comparable)")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Serve Prometheus metrics on this port and keep running after the pipeline")
+    args = parser.parse_args()
+
+    metrics = PipelineMetrics(trace_memory=args.trace_memory)
+    server = serve_metrics(metrics, args.metrics_port) if args.metrics_port else None
+
+    results = run_pipeline(metrics, incremental=args.incremental, price_backfill=args.price_backfill,
+                           use_cache=not args.no_cache)
+
+    if results is None:
+        print(f" No data fetched, {args.excel} left as is")
+    else:
+        with metrics.stage("write_report", rows_in=count_rows(list(report_sheets(results).values()))) as stage:
+            report = write_report(report_sheets(results), args.excel,
+                                  include_optional=not args.no_raw, optional_row_cap=args.raw_row_cap)
+            stage["rows_out"] = report["rows"] if report["written"] else 0
+        if report["written"]:
+            print(f" Report written to {args.excel} (changed sheets: {', '.join(report['changed'])})")
+            if report["carried_over"]:
+                print(f" Kept existing sheets: {', '.join(report['carried_over'])}")
+            if report["dropped"]:
+                print(f" Removed superseded sheets: {', '.join(report['dropped'])}")
+            with metrics.stage("snapshot", rows_in=count_rows(results["cleaned"])) as stage:
+                generation = publish_sheets(report_sheets(results), args.snapshot_dir,
+                                            supply_events=results["supply_events"], buckets=results["buckets"])
+                stage["rows_out"] = count_rows(results["cleaned"])
+            print(f" Snapshot published to {generation}")
+        else:
+            print(f" Report unchanged, {args.excel} left as is")
+
+    print(f" Run log written to {metrics.write_run_log(args.log_dir)}")
+
+    runs = load_run_logs(args.log_dir)
+    if len(runs) >= 2:
+        print("\n Stage comparison with previous run:")
+        print(compare_runs(runs[-2], runs[-1])[["wall_seconds_prev", "wall_seconds_curr", "wall_seconds_change_%",
+                                                "rows_out_prev", "rows_out_curr"]].to_string())
+    else:
+        print(pd.DataFrame(metrics.stages).to_string(index=False))
+
+    if server is not None:
+        print(f" Serving metrics on :{args.metrics_port}/metrics (Ctrl+C to stop)")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.shutdown()
+    return 1 if results is None else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from snapshot import read_mapped, write_arrow
+
+# Local historical price store: token x timestamp -> USD rate.
+# The API only embeds each token's *current* exchange rate, so every fetch adds
+# one observation per token at fetch time; older history can be backfilled from
+# a CSV. Transfers are priced with an as-of join per token (the last rate at or
+# before the transfer, or the earliest known rate for transfers that predate the
+# store), so re-pricing after a backfill is one columnar join, not a re-ingest.
+
+PRICE_STORE_PATH = "history/prices.arrow"
+PRICE_COLUMNS = ['token.symbol', 'timestamp', 'rate']
+
+
+def _naive_utc(when=None):
+    # Transfer timestamps are UTC ("...Z") stored without a zone, so price points must be too
+    when = pd.Timestamp.now(tz="UTC") if when is None else pd.Timestamp(when)
+    return when.tz_convert("UTC").tz_localize(None) if when.tzinfo is not None else when
+
+
+def observed_prices(df, fetched_at=None):
+    # The exchange rates embedded in a fetched batch, stamped with the fetch time
+    if 'token.exchange_rate' not in df.columns:
+        return pd.DataFrame(columns=PRICE_COLUMNS)
+    rates = pd.DataFrame({
+        'token.symbol': df['token.symbol'].to_numpy(dtype=object),
+        'rate': pd.to_numeric(df['token.exchange_rate'], errors='coerce').to_numpy(dtype=float),
+    }).dropna().drop_duplicates('token.symbol', keep='last')
+    rates.insert(1, 'timestamp', _naive_utc(fetched_at))
+    return rates[PRICE_COLUMNS]
+
+
+def read_price_csv(path):
+    # Backfill file with token.symbol (or token), timestamp and rate columns
+    prices = pd.read_csv(path).rename(columns={'token': 'token.symbol'})
+    prices['timestamp'] = pd.to_datetime(prices['timestamp'], errors='coerce', utc=True, format='mixed').dt.tz_localize(None)
+    prices['rate'] = pd.to_numeric(prices['rate'], errors='coerce')
+    return prices[PRICE_COLUMNS].dropna()
+
+
+class PriceStore:
+    def __init__(self, path=PRICE_STORE_PATH):
+        self.path = path
+        if path and os.path.exists(path):
+            self.prices = read_mapped(path)
+        else:
+            self.prices = pd.DataFrame({'token.symbol': pd.Series(dtype=object),
+                                        'timestamp': pd.Series(dtype='datetime64[ns]'),
+                                        'rate': pd.Series(dtype=float)})
+
+    @classmethod
+    def from_frame(cls, prices):
+        store = cls(None)
+        store.prices = prices
+        return store
+
+    def __len__(self):
+        return len(self.prices)
+
+    def add(self, prices):
+        # Merge new observations; a repeated (token, timestamp) takes the newer rate.
+        # Returns the number of points that are new or got a different rate, so a
+        # corrected backfill counts even though the store does not grow.
+        if prices.empty:
+            return 0
+        keys = ['token.symbol', 'timestamp']
+        incoming = prices[PRICE_COLUMNS].astype({'token.symbol': object, 'timestamp': 'datetime64[ns]'})
+        incoming = incoming.drop_duplicates(keys, keep='last')
+        existing = self.prices.astype({'token.symbol': object, 'timestamp': 'datetime64[ns]'})
+        previous = incoming.merge(existing, on=keys, how='left', suffixes=('', '_previous'))['rate_previous']
+        changed = int((previous.to_numpy() != incoming['rate'].to_numpy()).sum())  # NaN: new point
+        merged = pd.concat([existing, incoming], ignore_index=True).drop_duplicates(keys, keep='last')
+        self.prices = merged.sort_values(keys, kind='stable').reset_index(drop=True)
+        return changed
+
+    def observe(self, df, fetched_at=None):
+        # Rates seen in a fetch. A token whose rate has not moved since its latest
+        # point adds nothing: the as-of join would return the same rate anyway.
+        observed = observed_prices(df, fetched_at)
+        latest = self.prices.groupby('token.symbol')['rate'].last()
+        unchanged = observed['rate'].to_numpy() == observed['token.symbol'].map(latest).to_numpy(dtype=float)
+        return self.add(observed[~unchanged])
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        write_arrow(self.prices, self.path)
+
+    def rates_for(self, df, on='timestamp', by='token.symbol'):
+        # As-of rate for every row of df, aligned with df's row order (NaN if the token has no price)
+        if df.empty or self.prices.empty:
+            return np.full(len(df), np.nan)
+        left = pd.DataFrame({'row': np.arange(len(df)),
+                             by: df[by].to_numpy(dtype=object),
+                             on: df[on].to_numpy(dtype='datetime64[ns]')})
+        left = left[left[on].notna()].sort_values(on, kind='stable')
+        right = self.prices.rename(columns={'timestamp': on, 'token.symbol': by})
+        right = right.assign(**{by: right[by].to_numpy(dtype=object),
+                                on: right[on].to_numpy(dtype='datetime64[ns]')}).sort_values(on, kind='stable')
+        rates = np.full(len(df), np.nan)
+        if left.empty:
+            return rates
+        backward = pd.merge_asof(left, right, on=on, by=by, direction='backward')
+        forward = pd.merge_asof(left, right, on=on, by=by, direction='forward')
+        rates[backward['row'].to_numpy()] = backward['rate'].fillna(forward['rate']).to_numpy()
+        return rates
+
+
+def reprice(df, store):
+    # Bulk re-pricing of a cleaned frame: the embedded rate stays the fallback for
+    # tokens the store has never seen
+    rates = store.rates_for(df)
+    rates = np.where(np.isnan(rates), df['token.exchange_rate'].to_numpy(dtype=float), rates)
+    df = df.copy()
+    df['usd_rate'] = rates
+    df['usd_value'] = df['normalized_value'].to_numpy(dtype=float) * rates
+    return df
@@ -0,0 +1,167 @@
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+
+import pandas as pd
+import streamlit as st
+
+# Opt-in rerun profiler for the dashboards.
+# Enable with ?profile=1 in the URL or DASHBOARD_PROFILE=1 in the environment.
+# The app calls prof.section("name") at the start of every dashboard section;
+# each call closes the previous section, so the sections tile the whole rerun.
+# For every section we record wall time and the bytes sent to the browser
+# (delta messages, including Arrow tables, plus the PNGs behind st.pyplot).
+
+PROFILE_ENV = "DASHBOARD_PROFILE"
+PROFILE_DIR = "profiles"
+MAX_SAMPLES = 20000
+
+
+def profiling_enabled():
+    if os.environ.get(PROFILE_ENV) == "1":
+        return True
+    return st.query_params.get("profile") == "1"
+
+
+class ProfileStore:
+    # Process-wide sample buffer shared by every session (see profile_store())
+    def __init__(self, maxlen=MAX_SAMPLES):
+        self.samples = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def add(self, rows):
+        with self._lock:
+            self.samples.extend(rows)
+
+    def frame(self):
+        with self._lock:
+            return pd.DataFrame(list(self.samples))
+
+    def percentiles(self):
+        df = self.frame()
+        if df.empty:
+            return df
+        grouped = df.groupby(["app", "section"], sort=False)
+        summary = grouped["seconds"].quantile([0.5, 0.9, 0.99]).unstack()
+        summary.columns = ["p50_ms", "p90_ms", "p99_ms"]
+        summary = summary * 1000
+        summary["mean_payload_bytes"] = grouped["payload_bytes"].mean()
+        summary["reruns"] = grouped["rerun_id"].nunique()
+        return summary.round(2).reset_index()
+
+    def export(self, path=None):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = path or os.path.join(PROFILE_DIR, f"rerun_profile_{int(time.time())}.jsonl")
+        with open(path, "w") as f:
+            for row in self.frame().to_dict(orient="records"):
+                f.write(json.dumps(row, default=str) + "\n")
+        return path
+
+
+@st.cache_resource
+def profile_store():
+    return ProfileStore()
+
+
+def _media_bytes(msg):
+    # st.pyplot ships a URL in the delta; the PNG itself lives in the media store
+    try:
+        element = msg.delta.new_element
+        if element.WhichOneof("type") != "imgs":
+            return 0
+        from streamlit import runtime
+        storage = runtime.get_instance().media_file_mgr._storage
+        return sum(storage.get_file(img.url.rsplit("/", 1)[-1]).content_size for img in element.imgs.imgs)
+    except Exception:
+        return 0
+
+
+class RerunProfiler:
+    def __init__(self, app, enabled=None):
+        self.app = app
+        self.enabled = profiling_enabled() if enabled is None else enabled
+        self.rows = []
+        self._current = None
+        self._started = None
+        self._bytes = 0
+        self._hook = None
+        if self.enabled:
+            self._rerun_started = time.perf_counter()
+            self._rerun_id = uuid.uuid4().hex[:8]
+            self._hook_enqueue()
+
+    def _hook_enqueue(self):
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx()
+        if ctx is None:
+            return
+        # The context is reused across a session's reruns, and a rerun interrupted by
+        # a widget change never reaches finish(). So the wrapper is installed once per
+        # context and only pointed at the current profiler, never stacked.
+        hook = ctx._enqueue if hasattr(ctx._enqueue, "profiler") else None
+        if hook is None:
+            original = ctx._enqueue
+
+            def hook(msg):
+                profiler = hook.profiler
+                if profiler is not None:
+                    profiler._bytes += msg.ByteSize() + _media_bytes(msg)
+                original(msg)
+
+            ctx._enqueue = hook
+        hook.profiler = self
+        self._hook = hook
+        self._session_id = ctx.session_id
+
+    def _close_section(self):
+        if self._current is None:
+            return
+        self.rows.append({
+            "app": self.app,
+            "session_id": getattr(self, "_session_id", None),
+            "rerun_id": self._rerun_id,
+            "section": self._current,
+            "seconds": time.perf_counter() - self._started,
+            "payload_bytes": self._bytes,
+            "recorded_at": time.time(),
+        })
+        self._current = None
+
+    def section(self, name):
+        if not self.enabled:
+            return
+        self._close_section()
+        self._current = name
+        self._started = time.perf_counter()
+        self._bytes = 0
+
+    def finish(self):
+        if not self.enabled:
+            return
+        self._close_section()
+        if self._hook is not None and self._hook.profiler is self:
+            self._hook.profiler = None
+        total = time.perf_counter() - self._rerun_started
+        store = profile_store()
+        store.add(self.rows)
+        self.render(store, total)
+
+    def render(self, store, total):
+        with st.expander(f"🐞 Rerun profile — {total * 1000:.0f} ms", expanded=False):
+            this_run = pd.DataFrame(self.rows)[["section", "seconds", "payload_bytes"]]
+            this_run["ms"] = (this_run.pop("seconds") * 1000).round(2)
+            this_run["share_%"] = (this_run["ms"] / (total * 1000) * 100).round(1)
+            st.markdown("##### This rerun")
+            st.dataframe(this_run, hide_index=True)
+
+            st.markdown("##### All sessions (since server start)")
+            st.dataframe(store.percentiles(), hide_index=True)
+
+            samples = store.frame()
+            st.download_button("Download samples (CSV)", data=samples.to_csv(index=False),
+                               file_name=f"{self.app}_rerun_profile.csv", mime="text/csv")
+            if st.button("Export samples to disk"):
+                st.caption(f"Written to {store.export()}")
@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import time
+import zipfile
+from xml.etree import ElementTree
+
+import pandas as pd
+
+# Single-pass Excel export for the pipeline results.
+# All sheets are streamed row by row into one new workbook with xlsxwriter's
+# constant_memory mode (one row buffered at a time, inline strings), instead of
+# re-opening and re-writing the whole workbook through openpyxl once per task.
+# Time and memory grow linearly with the number of rows written.
+# Sheets already in the workbook that the report does not produce (e.g. Sheet1)
+# are copied over as plain values, in their old position; sheets the report has
+# superseded are removed instead of being kept as a stale copy.
+#
+# Known limit: unchanged sheets are only skipped when the whole workbook is
+# unchanged. If any sheet changed, every sheet is rewritten (an .xlsx is a single
+# zip archive and sheets share its string and style tables).
+
+REPORT_CHUNK_ROWS = 10000
+
+# Large diagnostic sheets that may be dropped or row-capped
+OPTIONAL_SHEETS = ["Raw_fetched_records"]
+
+# Sheets older exports wrote that a report sheet now replaces (old -> replacement);
+# they are dropped on the next write unless the caller produces them again
+SUPERSEDED_SHEETS = {"Total fetched records": "Raw_fetched_records"}
+
+
+def sheet_fingerprint(df):
+    digest = hashlib.sha256()
+    digest.update(json.dumps([str(c) for c in df.columns]).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def manifest_path(path):
+    return path + ".sheets.json"
+
+
+def read_manifest(path):
+    if not (os.path.exists(path) and os.path.exists(manifest_path(path))):
+        return {}
+    with open(manifest_path(path)) as f:
+        return json.load(f)
+
+
+def workbook_sheet_names(path):
+    # Sheet names from xl/workbook.xml, without loading the workbook
+    with zipfile.ZipFile(path) as archive:
+        root = ElementTree.fromstring(archive.read("xl/workbook.xml"))
+    return [sheet.get("name") for sheet in root.iter() if sheet.tag.endswith("}sheet")]
+
+
+def _write_sheet(workbook, name, df, header_format):
+    worksheet = workbook.add_worksheet(name[:31])
+    worksheet.write_row(0, 0, [str(c) for c in df.columns], header_format)
+    # Rows must go out in order for constant_memory; convert one chunk at a time
+    for start in range(0, len(df), REPORT_CHUNK_ROWS):
+        block = df.iloc[start:start + REPORT_CHUNK_ROWS].astype(object)
+        block = block.where(block.notna(), None)
+        for offset, row in enumerate(block.itertuples(index=False, name=None)):
+            worksheet.write_row(start + offset + 1, 0, row)
+
+
+def _copy_sheet(workbook, worksheet):
+    # Values only: formatting, formulas and merged cells of foreign sheets are not kept
+    target = workbook.add_worksheet(worksheet.title)
+    for row_number, row in enumerate(worksheet.iter_rows(values_only=True)):
+        target.write_row(row_number, 0, row)
+
+
+def write_report(sheets, path, include_optional=True, optional_row_cap=None, force=False, keep_other_sheets=True):
+    # sheets maps sheet name -> DataFrame, in workbook order.
+    # Returns what happened: changed/unchanged sheets, rows written, seconds.
+    import xlsxwriter
+
+    start = time.perf_counter()
+    selected = {}
+    for name, df in sheets.items():
+        if name in OPTIONAL_SHEETS:
+            if not include_optional:
+                continue
+            if optional_row_cap is not None:
+                df = df.head(optional_row_cap)
+        selected[name] = df
+
+    fingerprints = {name: sheet_fingerprint(df) for name, df in selected.items()}
+    previous = read_manifest(path)
+    changed = [name for name in selected if previous.get(name) != fingerprints[name]]
+    unchanged = [name for name in selected if name not in changed]
+    result = {"path": path, "changed": changed, "unchanged": unchanged,
+              "rows": sum(len(df) for df in selected.values())}
+
+    # An .xlsx is one zip archive, so a sheet cannot be replaced in place:
+    # either nothing changed and the file is left alone, or it is rewritten once.
+    stale = [name for name in workbook_sheet_names(path) if name in SUPERSEDED_SHEETS and name not in selected] \
+        if os.path.exists(path) else []
+    if not force and not changed and not stale and set(previous) == set(fingerprints):
+        result.update(written=False, seconds=time.perf_counter() - start)
+        return result
+
+    tmp_path = path + ".tmp.xlsx"
+    workbook = xlsxwriter.Workbook(tmp_path, {
+        "constant_memory": True,
+        "default_date_format": "yyyy-mm-dd hh:mm:ss",
+        "strings_to_formulas": False,
+        "strings_to_urls": False,
+        "nan_inf_to_errors": True,
+    })
+    header_format = workbook.add_format({"bold": True, "border": 1, "align": "center"})
+    source = None
+    if keep_other_sheets and os.path.exists(path):
+        from openpyxl import load_workbook
+        source = load_workbook(path, read_only=True)
+    try:
+        existing = source.sheetnames if source is not None else []
+        # Existing sheets keep their order; new report sheets go at the end
+        order = [name for name in existing
+                 if name in selected or (name not in sheets and name not in SUPERSEDED_SHEETS)]
+        order += [name for name in selected if name not in existing]
+        for name in order:
+            if name in selected:
+                _write_sheet(workbook, name, selected[name], header_format)
+            else:
+                _copy_sheet(workbook, source[name])
+        result["carried_over"] = [name for name in order if name not in selected]
+        result["dropped"] = [name for name in existing if name in SUPERSEDED_SHEETS and name not in selected]
+    finally:
+        if source is not None:
+            source.close()
+    workbook.close()
+    os.replace(tmp_path, path)
+
+    with open(manifest_path(path), "w") as f:
+        json.dump(fingerprints, f, indent=2)
+
+    result.update(written=True, seconds=time.perf_counter() - start)
+    return result
@@ -0,0 +1,262 @@
+import os
+import shutil
+import time
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from address_index import build_address_rows
+from supply_index import SupplyIndex
+from timebuckets import volume_buckets
+
+try:
+    import fcntl
+except ImportError:  # no advisory locks on Windows; single-process use only there
+    fcntl = None
+
+# Immutable, memory-mapped snapshot of the Excel results.
+# Every sheet is published once as an Arrow IPC file; each Streamlit session and
+# every server process on the host maps the same file read-only, so the OS page
+# cache holds a single copy of the data no matter how many readers there are.
+# A publish writes a complete generation directory and then swaps the CURRENT
+# pointer with one rename, so readers see either the old or the new set of
+# frames, never a mix (row ids in address_rows must match cleaned).
+
+SNAPSHOT_DIR = "snapshot"
+CURRENT_FILE = "CURRENT"
+KEEP_GENERATIONS = 2  # the live one plus the previous one, for readers still mapping it
+
+# Arrow-backed strings over the mapped buffers. Asked for explicitly: pandas 2.x
+# would otherwise turn every string column into Python objects in each process.
+try:
+    MAPPED_STRING_DTYPE = pd.StringDtype("pyarrow", na_value=np.nan)  # pandas' default str (>= 2.3)
+except TypeError:
+    MAPPED_STRING_DTYPE = pd.StringDtype("pyarrow")
+
+# snapshot name -> (Excel sheet, columns parsed as dates)
+SNAPSHOT_SHEETS = {
+    "summary": ("task3_summary_report", []),
+    "cleaned": ("Total_cleaned_records", ["timestamp"]),
+    "trend": ("task4_volume_per_day", ["date"]),
+    "supply": ("task4_cumulative_supply", ["date"]),
+    "top": ("task4_top_tokens", []),
+}
+
+
+def _to_arrow(df):
+    # Strings go to large_string and numerics keep their NaNs (no null bitmap),
+    # which is what lets load_snapshot hand the mapped buffers to pandas as-is
+    arrays = {}
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_numeric_dtype(series) or pd.api.types.is_datetime64_any_dtype(series):
+            arrays[col] = pa.array(series.to_numpy())
+        else:
+            arrays[col] = pa.array(series.astype("string").to_numpy(na_value=None), type=pa.large_string())
+    return pa.table(arrays)
+
+
+def write_arrow(df, path):
+    table = _to_arrow(df)
+    # Unique temp name, so concurrent writers never interleave in one file
+    tmp_path = f"{path}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp"
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=max(len(df), 1))
+    # Atomic swap: readers that already mapped the old file keep their inode
+    os.replace(tmp_path, path)
+
+
+# Aggregates that do not depend on any widget are computed once at publish time,
+# so a cold first page only maps them instead of running the groupbys
+DERIVED_FRAMES = ["weekly", "monthly", "spikes", "active", "supply_events", "address_rows", "volume_buckets"]
+
+
+def derive_aggregates(frames, supply_events=None, buckets=None):
+    # supply_events / buckets: the pipeline's persisted supply index (to_frame())
+    # and its volume_buckets output; rebuilt from the cleaned records when not given
+    df_trend = frames["trend"]
+    df_cleaned = frames["cleaned"]
+
+    trend_dates = pd.to_datetime(df_trend['date'])
+    week_key = trend_dates.dt.to_period('W').dt.start_time.rename('week')
+    month_key = trend_dates.dt.to_period('M').dt.start_time.rename('month')
+    weekly_vol = df_trend.groupby([week_key, 'token'])['daily_volume'].sum().reset_index()
+    monthly_vol = df_trend.groupby([month_key, 'token'])['daily_volume'].sum().reset_index()
+
+    mint_burn_spikes = df_cleaned[df_cleaned['type'].isin(['token_minting', 'token_burning'])]
+    spike_date = pd.to_datetime(mint_burn_spikes['timestamp'].dt.date).rename('date')
+    spikes_summary = mint_burn_spikes.groupby([spike_date, 'token.symbol', 'type'])['normalized_value'].sum().reset_index()
+    pivot_spikes = spikes_summary.pivot(index=['date', 'token.symbol'], columns='type', values='normalized_value').fillna(0)
+    pivot_spikes = pivot_spikes.reset_index()
+    pivot_spikes.columns.name = None
+
+    most_active = df_cleaned[df_cleaned['type'] == 'token_transfer'].groupby('token.symbol')['transaction_hash'].count().reset_index()
+    most_active.columns = ['token.symbol', 'transaction_count']
+    most_active = most_active.sort_values(by='transaction_count', ascending=False).head(10)
+
+    if supply_events is None:
+        supply_events = SupplyIndex.from_frame(df_cleaned).to_frame()
+
+    # Row ids refer to the published (time-sorted) cleaned frame
+    address_rows = build_address_rows(df_cleaned)
+
+    # Hour/day/week/month volume per token for the auto-resolution trend charts
+    if buckets is None:
+        buckets = volume_buckets(df_cleaned)
+
+    return {"weekly": weekly_vol, "monthly": monthly_vol, "spikes": pivot_spikes, "active": most_active,
+            "supply_events": supply_events, "address_rows": address_rows, "volume_buckets": buckets}
+
+
+@contextmanager
+def _publish_lock(snapshot_dir):
+    # Replicas starting on one host queue here; the first one publishes and the
+    # others find a fresh snapshot once they get the lock
+    os.makedirs(snapshot_dir, exist_ok=True)
+    with open(os.path.join(snapshot_dir, ".lock"), "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def current_generation(snapshot_dir=SNAPSHOT_DIR):
+    try:
+        with open(os.path.join(snapshot_dir, CURRENT_FILE)) as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return os.path.join(snapshot_dir, name) if name else None
+
+
+def _write_generation(frames, snapshot_dir):
+    name = f"gen-{time.time_ns()}-{os.getpid()}"
+    generation = os.path.join(snapshot_dir, name)
+    os.makedirs(generation)
+    for frame_name, df in frames.items():
+        write_arrow(df, os.path.join(generation, f"{frame_name}.arrow"))
+    pointer_tmp = os.path.join(snapshot_dir, f"{CURRENT_FILE}.{os.getpid()}.tmp")
+    with open(pointer_tmp, "w") as f:
+        f.write(name)
+    os.replace(pointer_tmp, os.path.join(snapshot_dir, CURRENT_FILE))
+
+    # Mapped files stay readable after their directory is removed (POSIX)
+    generations = sorted(e for e in os.listdir(snapshot_dir) if e.startswith("gen-"))
+    for old in generations[:-KEEP_GENERATIONS]:
+        if old != name:
+            shutil.rmtree(os.path.join(snapshot_dir, old), ignore_errors=True)
+    return generation
+
+
+def publish_frames(frames, snapshot_dir=SNAPSHOT_DIR):
+    with _publish_lock(snapshot_dir):
+        return _write_generation(frames, snapshot_dir)
+
+
+def sheet_frames(sheets, supply_events=None, buckets=None):
+    # Snapshot frames from workbook sheets (sheet name -> frame)
+    frames = {}
+    for name, (sheet, date_cols) in SNAPSHOT_SHEETS.items():
+        df = sheets[sheet]
+        frames[name] = df.assign(**{col: pd.to_datetime(df[col]) for col in date_cols})
+    # Sorted by time so date filters become contiguous slices (see time_slice)
+    frames["cleaned"] = frames["cleaned"].sort_values("timestamp", kind="stable").reset_index(drop=True)
+    frames.update(derive_aggregates(frames, supply_events, buckets))
+    return frames
+
+
+def read_workbook_frames(excel_path):
+    sheets = {sheet: pd.read_excel(excel_path, sheet_name=sheet, parse_dates=date_cols or False)
+              for sheet, date_cols in SNAPSHOT_SHEETS.values()}
+    return sheet_frames(sheets)
+
+
+def publish_sheets(sheets, snapshot_dir=SNAPSHOT_DIR, supply_events=None, buckets=None):
+    # Publish straight from the pipeline's frames, after the workbook is written,
+    # so the dashboards never re-read it and get the persisted supply index and
+    # the volume buckets the pipeline already computed
+    with _publish_lock(snapshot_dir):
+        return _write_generation(sheet_frames(sheets, supply_events, buckets), snapshot_dir)
+
+
+def publish_snapshot(excel_path, snapshot_dir=SNAPSHOT_DIR):
+    with _publish_lock(snapshot_dir):
+        # Re-checked under the lock: another replica may have just published it
+        if snapshot_is_stale(excel_path, snapshot_dir):
+            _write_generation(read_workbook_frames(excel_path), snapshot_dir)
+
+
+def snapshot_is_stale(excel_path, snapshot_dir=SNAPSHOT_DIR):
+    generation = current_generation(snapshot_dir)
+    if generation is None:
+        return True
+    paths = [os.path.join(generation, f"{name}.arrow") for name in snapshot_names()]
+    if not all(os.path.exists(p) for p in paths):
+        return True
+    source_mtime = os.path.getmtime(excel_path)
+    return any(os.path.getmtime(p) < source_mtime for p in paths)
+
+
+def _mapped_column(chunk):
+    if pa.types.is_large_string(chunk.type):
+        # Arrow-backed string column that points straight into the mapping
+        return chunk.to_pandas(types_mapper={pa.large_string(): MAPPED_STRING_DTYPE}.get).array
+    try:
+        return chunk.to_numpy(zero_copy_only=True)
+    except pa.ArrowInvalid:
+        # Columns with nulls cannot be viewed as numpy; only these get copied
+        return chunk.to_numpy(zero_copy_only=False)
+
+
+def read_mapped(path):
+    source = pa.memory_map(path, "r")
+    table = pa.ipc.open_file(source).read_all()
+    columns = {}
+    for name, column in zip(table.column_names, table.columns):
+        chunk = column.chunk(0) if column.num_chunks == 1 else pa.concat_arrays(column.chunks)
+        columns[name] = _mapped_column(chunk)
+    # copy=False keeps one block per column over the read-only mapped buffers
+    return pd.DataFrame(columns, copy=False)
+
+
+def snapshot_names():
+    return list(SNAPSHOT_SHEETS) + DERIVED_FRAMES
+
+
+def load_snapshot(snapshot_dir=SNAPSHOT_DIR):
+    # The pointer is read once, so every frame comes from the same generation
+    generation = current_generation(snapshot_dir)
+    return {name: read_mapped(os.path.join(generation, f"{name}.arrow")) for name in snapshot_names()}
+
+
+def ensure_snapshot(excel_path, snapshot_dir=SNAPSHOT_DIR):
+    if snapshot_is_stale(excel_path, snapshot_dir):
+        publish_snapshot(excel_path, snapshot_dir)
+    return load_snapshot(snapshot_dir)
+
+
+def time_slice(df, start, end, column="timestamp"):
+    # Binary search on the time-sorted column -> iloc slice, which is a view, not a copy
+    values = df[column].to_numpy()
+    lo = np.searchsorted(values, np.datetime64(pd.Timestamp(start)), side="left")
+    hi = np.searchsorted(values, np.datetime64(pd.Timestamp(end) + pd.Timedelta(days=1)), side="left")
+    return df.iloc[lo:hi]
+
+
+def select_rows(df, equals):
+    # Equality filters on a snapshot frame; "All" (or None) means no filter.
+    # Only the matching rows are materialised, never the full frame.
+    mask = None
+    for column, value in equals.items():
+        if value is None or value == "All":
+            continue
+        match = (df[column] == value).to_numpy(dtype=bool, na_value=False)
+        mask = match if mask is None else mask & match
+    return df if mask is None else df[mask]
@@ -0,0 +1,195 @@
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import shutil
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import count_rows
+
+# Content-addressed cache for the pipeline's stages.
+# Each stage declares the artifacts it reads and writes. Its cache key is a hash
+# of its code (its own source, the functions it calls and the module-level
+# constants they read), the pandas/numpy versions and the contents of its
+# inputs, so a stage is recomputed only when its code or the data reaching it
+# changed. Stages whose inputs are all available run concurrently;
+# CPU time is then per stage (thread), memory peaks only for the whole graph.
+
+STAGE_CACHE_DIR = "stage_cache"
+CACHE_FORMAT = 1  # bump to invalidate every cached entry
+MAX_ENTRIES_PER_STAGE = 4
+
+
+LIBRARY_VERSIONS = f"pandas={pd.__version__} numpy={np.__version__}"
+
+
+def _global_names(code):
+    # Names a code object looks up, including those of nested comprehensions and lambdas
+    names = list(code.co_names)
+    for const in code.co_consts:
+        if inspect.iscode(const):
+            names += _global_names(const)
+    return names
+
+
+def _constant_repr(value):
+    # Stable text for plain data constants (sets sorted: their order varies between
+    # processes); None for anything else, e.g. modules, which do not go into the key
+    if value is None or isinstance(value, (str, bytes, bool, int, float)):
+        return repr(value)
+    if isinstance(value, (list, tuple)):
+        items = [_constant_repr(v) for v in value]
+        return None if None in items else f"{type(value).__name__}[{', '.join(items)}]"
+    if isinstance(value, (set, frozenset)):
+        items = [_constant_repr(v) for v in value]
+        return None if None in items else f"set[{', '.join(sorted(items))}]"
+    if isinstance(value, dict):
+        items = [(_constant_repr(k), _constant_repr(v)) for k, v in value.items()]
+        return None if any(None in pair for pair in items) else f"dict[{', '.join(f'{k}: {v}' for k, v in items)}]"
+    return None
+
+
+def code_version(obj, seen=None):
+    # Source of a function or class plus, recursively, the module-level functions
+    # it refers to and the values of the module-level constants it reads
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return ""
+    seen.add(id(obj))
+    try:
+        parts = [inspect.getsource(obj)]
+    except (OSError, TypeError):
+        return getattr(obj, "__qualname__", repr(obj))
+    if inspect.isfunction(obj):
+        for name in dict.fromkeys(_global_names(obj.__code__)):
+            if name not in obj.__globals__:
+                continue
+            ref = obj.__globals__[name]
+            if inspect.isfunction(ref) or inspect.isclass(ref):
+                parts.append(code_version(ref, seen))
+            else:
+                constant = _constant_repr(ref)
+                if constant is not None:
+                    parts.append(f"{name} = {constant}")
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+
+def artifact_digest(value):
+    h = hashlib.sha256()
+    if isinstance(value, pd.DataFrame):
+        h.update(repr([str(c) for c in value.columns]).encode())
+        h.update(pd.util.hash_pandas_object(value, index=False).to_numpy().tobytes())
+    else:
+        h.update(pickle.dumps(value))
+    return h.hexdigest()
+
+
+class Stage:
+    # fn(*inputs) returns one value, or a tuple in the order of `outputs`.
+    # cache=False is for stages with side effects (they run on every call).
+    # row_inputs: the inputs counted as rows_in (default all); lookup tables such
+    # as the price table are left out so rows_in is the data the stage processes.
+    def __init__(self, name, fn, inputs, outputs, cache=True, row_inputs=None):
+        self.name = name
+        self.fn = fn
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.row_inputs = self.inputs if row_inputs is None else list(row_inputs)
+        self.cache = cache
+        self.version = code_version(fn) if cache else None
+
+    def key(self, input_digests):
+        h = hashlib.sha256(f"{CACHE_FORMAT}:{LIBRARY_VERSIONS}:{self.name}:{self.version}".encode())
+        for digest in input_digests:
+            h.update(digest.encode())
+        return h.hexdigest()[:32]
+
+
+class StageCache:
+    def __init__(self, path=STAGE_CACHE_DIR, max_entries=MAX_ENTRIES_PER_STAGE):
+        self.path = path
+        self.max_entries = max_entries
+
+    def _entry(self, name, key):
+        return os.path.join(self.path, name, key)
+
+    def load(self, name, key):
+        entry = self._entry(name, key)
+        path = os.path.join(entry, "outputs.pkl")
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            outputs = pickle.load(f)
+        os.utime(entry)  # most recently used, for eviction
+        return outputs
+
+    def store(self, name, key, outputs, seconds):
+        entry = self._entry(name, key)
+        os.makedirs(entry, exist_ok=True)
+        tmp_path = os.path.join(entry, "outputs.pkl.tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump(outputs, f, protocol=5)
+        with open(os.path.join(entry, "meta.json"), "w") as f:
+            json.dump({"stage": name, "key": key, "compute_seconds": seconds,
+                       "created_at": time.time()}, f, indent=2)
+        os.replace(tmp_path, os.path.join(entry, "outputs.pkl"))
+        self._evict(name)
+
+    def _evict(self, name):
+        stage_dir = os.path.join(self.path, name)
+        entries = sorted((os.path.join(stage_dir, e) for e in os.listdir(stage_dir)), key=os.path.getmtime)
+        for entry in entries[:-self.max_entries]:
+            shutil.rmtree(entry, ignore_errors=True)
+
+
+def _run_stage(stage, args, key, cache, metrics):
+    rows_in = count_rows([arg for name, arg in zip(stage.inputs, args) if name in stage.row_inputs])
+    with metrics.stage(stage.name, rows_in=rows_in, concurrent=True) as record:
+        outputs = cache.load(stage.name, key) if key is not None else None
+        hit = outputs is not None
+        if not hit:
+            start = time.perf_counter()
+            result = stage.fn(*args)
+            outputs = tuple(result) if len(stage.outputs) > 1 else (result,)
+            if key is not None:
+                cache.store(stage.name, key, outputs, time.perf_counter() - start)
+        record["rows_out"] = count_rows(list(outputs))
+        record["cache_hit"] = int(hit)
+    status = "hit" if hit else ("miss" if key is not None else "uncached")
+    return outputs, {"stage": stage.name, "cache": status, "seconds": round(record["wall_seconds"], 3)}
+
+
+def run_stages(stages, artifacts, metrics, cache=None, max_workers=4):
+    # Runs every stage once its inputs are in `artifacts` (name -> value), adding
+    # its outputs as it finishes. Returns one {stage, cache, seconds} row per stage.
+    digests = {}
+    pending = list(stages)
+    running = {}
+    report = []
+    with metrics.stage("stage_graph"), ThreadPoolExecutor(max_workers) as pool:
+        while pending or running:
+            for stage in [s for s in pending if all(name in artifacts for name in s.inputs)]:
+                pending.remove(stage)
+                args = [artifacts[name] for name in stage.inputs]
+                key = None
+                if cache is not None and stage.cache:
+                    for name in stage.inputs:
+                        if name not in digests:
+                            digests[name] = artifact_digest(artifacts[name])
+                    key = stage.key([digests[name] for name in stage.inputs])
+                running[pool.submit(_run_stage, stage, args, key, cache, metrics)] = stage
+            if not running:
+                missing = {name for s in pending for name in s.inputs if name not in artifacts}
+                raise ValueError(f"No stage produces {sorted(missing)}")
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                outputs, status = future.result()
+                artifacts.update(zip(stage.outputs, outputs))
+                report.append(status)
+    return report
@@ -1,24 +1,25 @@
 
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import matplotlib.dates as mdates
+from snapshot import ensure_snapshot, time_slice, select_rows
+from profiler import RerunProfiler
+from timebuckets import plot_downsampled
 
 st.set_page_config(page_title="Advanced Token Insights", layout="wide")
+prof = RerunProfiler("advanced")  # opt-in: ?profile=1 or DASHBOARD_PROFILE=1
 st.title("📊 Advanced Token Analytics Dashboard")
+prof.section("load")
 
-@st.cache_data
+# Shared read-only memory-mapped snapshot (see snapshot.py) instead of a per-session copy
+@st.cache_resource
 def load_data():
     excel_path = "DE_Assesment_Results.xlsx"
-    df = pd.read_excel(excel_path, sheet_name="Total_cleaned_records", parse_dates=["timestamp"])
-    return df
+    return ensure_snapshot(excel_path)["cleaned"]
 
 df = load_data()
-df['hour'] = df['timestamp'].dt.hour
-df['date'] = df['timestamp'].dt.date
 
 # Sidebar filters
+prof.section("filters")
 all_tokens = df['token.symbol'].dropna().unique().tolist()
 all_types = df['type'].dropna().unique().tolist()
 min_date = df['timestamp'].min().date()
@@ -29,18 +30,16 @@ selected_token = st.sidebar.selectbox("Select Token", ["All"] + all_tokens)
 selected_type = st.sidebar.selectbox("Select Type", ["All"] + all_types)
 date_range = st.sidebar.date_input("Date Range", [min_date, max_date])
 
-df_filtered = df.copy()
-if selected_token != "All":
-    df_filtered = df_filtered[df_filtered['token.symbol'] == selected_token]
-if selected_type != "All":
-    df_filtered = df_filtered[df_filtered['type'] == selected_type]
-df_filtered = df_filtered[
-    (df_filtered['timestamp'].dt.date >= date_range[0]) &
-    (df_filtered['timestamp'].dt.date <= date_range[1])
-]
+df_filtered = df
+if len(date_range) == 2:
+    df_filtered = time_slice(df_filtered, date_range[0], date_range[1])
+df_filtered = select_rows(df_filtered, {'token.symbol': selected_token, 'type': selected_type})
 
 # USD Value Distribution
+prof.section("usd_distribution")
 st.subheader("💰 USD Value Distribution")
+# Plotting libraries load with the first panel that draws, after the filters are on screen
+import matplotlib.pyplot as plt
 fig1, ax1 = plt.subplots(figsize=(6, 3))
 ax1.hist(df_filtered['usd_value'], bins=50, color='skyblue')
 ax1.set_xlabel("USD Value")
@@ -49,11 +48,13 @@ st.pyplot(fig1)
 st.dataframe(df_filtered[['timestamp', 'token.symbol', 'usd_value']].sort_values(by='usd_value', ascending=False).head(10))
 
 # Token Utilization Pattern
+prof.section("utilization_pivot")
 st.subheader("🧠 Token Utilization Pattern (Pivot Table)")
 pivot_util = pd.pivot_table(df_filtered, values="normalized_value", index="token.symbol", columns="type", aggfunc="sum", fill_value=0)
 st.dataframe(pivot_util)
 
 # Top Tokens by USD Value
+prof.section("top_usd")
 st.subheader("🏁 Top Tokens by USD Value")
 top_usd = df_filtered.groupby("token.symbol")["usd_value"].sum().sort_values(ascending=False).head(10).reset_index()
 fig2, ax2 = plt.subplots(figsize=(6, 3))
@@ -63,35 +64,42 @@ st.pyplot(fig2)
 st.dataframe(top_usd)
 
 # Hourly Transfer Heatmap
+prof.section("hourly_heatmap")
 st.subheader("🕓 Hourly Transfer Heatmap")
-heatmap_df = df_filtered.groupby(['token.symbol', 'hour'])['transaction_hash'].count().unstack().fillna(0)
+import seaborn as sns  # only this panel needs seaborn
+heatmap_df = df_filtered.groupby(['token.symbol', df_filtered['timestamp'].dt.hour.rename('hour')])['transaction_hash'].count().unstack().fillna(0)
 fig3, ax3 = plt.subplots(figsize=(10, 4))
 sns.heatmap(heatmap_df, cmap="Blues", linewidths=0.5, ax=ax3)
 ax3.set_title("Transactions per Hour per Token")
 st.pyplot(fig3)
 
 # Rolling 7-day average volume
+prof.section("rolling_volume")
 st.subheader("📅 7-Day Rolling Average Volume")
-df_volume = df_filtered.groupby(['date', 'token.symbol'])['normalized_value'].sum().reset_index()
+df_volume = df_filtered.groupby([df_filtered['timestamp'].dt.date.rename('date'), 'token.symbol'])['normalized_value'].sum().reset_index()
 df_volume['rolling_avg'] = df_volume.groupby("token.symbol")["normalized_value"].transform(lambda x: x.rolling(7, 1).mean())
 fig4, ax4 = plt.subplots(figsize=(10, 4))
 for token in df_volume['token.symbol'].unique():
     subset = df_volume[df_volume['token.symbol'] == token]
-    ax4.plot(subset['date'], subset['rolling_avg'], marker='o', label=token)
+    plot_downsampled(ax4, subset['date'], subset['rolling_avg'], label=token)
 ax4.legend(fontsize=6)
 ax4.tick_params(axis='x', labelrotation=45)
 st.pyplot(fig4)
 
 # Spike Detection (above 95th percentile)
+prof.section("anomalies")
 st.subheader("🚨 Anomaly Detection: High-Value Transfers")
 threshold = df_filtered['normalized_value'].quantile(0.95)
 spikes = df_filtered[df_filtered['normalized_value'] > threshold]
 st.dataframe(spikes[['timestamp', 'token.symbol', 'type', 'normalized_value', 'usd_value']].sort_values(by='normalized_value', ascending=False))
 
 # Download section
+prof.section("download")
 st.subheader("⬇️ Download Insight Data")
 csv = df_filtered.to_csv(index=False)
 st.download_button("Download Filtered Data (CSV)", data=csv, file_name="filtered_token_data.csv", mime="text/csv")
 
 st.markdown("---")
 st.markdown("Made with ❤️ by Qenehelo Matjama | Advanced Dashboard")
+
+prof.finish()
@@ -1,26 +1,47 @@
 
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
+from snapshot import ensure_snapshot, time_slice, select_rows
+from profiler import RerunProfiler
+from supply_index import SupplyIndex
+from timebuckets import BUCKET_FREQS, axis_pixels, buckets_in_range, pick_resolution, plot_downsampled
+
+# matplotlib is imported by the chart panels themselves (see charts()), so the
+# header, filters and summary table render before the plotting stack is loaded.
+def charts():
+    import matplotlib.pyplot as plt
+    import matplotlib.dates as mdates
+    return plt, mdates
 
 # === Load Data ===
-@st.cache_data
+# cache_resource hands every session the same memory-mapped frames (no pickling,
+# no per-session copy); they are read-only, so never assign columns on them.
+@st.cache_resource
 def load_data():
     excel_path = "DE_Assesment_Results.xlsx"
-    df_summary = pd.read_excel(excel_path, sheet_name="task3_summary_report")
-    df_cleaned = pd.read_excel(excel_path, sheet_name="Total_cleaned_records")
-    df_trend = pd.read_excel(excel_path, sheet_name="task4_volume_per_day", parse_dates=['date'])
-    df_supply = pd.read_excel(excel_path, sheet_name="task4_cumulative_supply", parse_dates=['date'])
-    df_top = pd.read_excel(excel_path, sheet_name="task4_top_tokens")
-    return df_summary, df_cleaned, df_trend, df_supply, df_top
+    return ensure_snapshot(excel_path)
+
+# Prefix-sum supply index over the snapshot's mint/burn events (see supply_index.py)
+@st.cache_resource
+def load_supply_index():
+    return SupplyIndex.from_events(load_data()["supply_events"])
+
+RESOLUTION_LABELS = {"hour": "Hourly", "day": "Daily", "week": "Weekly", "month": "Monthly"}
+# "Auto" picks the finest bucket that fits the chart width (see timebuckets.py)
+SUPPLY_RESOLUTIONS = {"Auto": "auto", "Hour": "h", "Day": "D", "Week": "W", "Exact": None}
+# The supply table is the daily series whatever the chart shows, latest rows first
+SUPPLY_TABLE_ROWS = 500
 
 st.set_page_config(page_title="Token Analytics Dashboard", layout="wide")
+prof = RerunProfiler("final")  # opt-in: ?profile=1 or DASHBOARD_PROFILE=1
 st.title("📊 Token Distribution & Blockchain Trend Dashboard")
+prof.section("load")
 
-df_summary, df_cleaned, df_trend, df_supply, df_top = load_data()
+snap = load_data()
+df_summary, df_cleaned, df_trend, df_top = snap["summary"], snap["cleaned"], snap["trend"], snap["top"]
 
 # === Sidebar Filters ===
+prof.section("filters")
 all_tokens = df_cleaned['token.symbol'].dropna().unique().tolist()
 all_types = df_cleaned['type'].dropna().unique().tolist()
 min_date = df_cleaned['timestamp'].min()
@@ -34,19 +55,16 @@ selected_type = st.sidebar.selectbox("Select Transaction Type", ["All"] + all_ty
 selected_date = st.sidebar.date_input("Filter by Date Range", [min_date, max_date])
 rate_range = st.sidebar.slider("Token Exchange Rate", min_value=0.001, max_value=1.0, value=(min_rate, max_rate))
 
-df_filtered = df_cleaned.copy()
-if selected_token != "All":
-    df_filtered = df_filtered[df_filtered['token.symbol'] == selected_token]
-if selected_type != "All":
-    df_filtered = df_filtered[df_filtered['type'] == selected_type]
-df_filtered = df_filtered[
-    (df_filtered['timestamp'].dt.date >= selected_date[0]) &
-    (df_filtered['timestamp'].dt.date <= selected_date[1]) &
-    (df_filtered['token.exchange_rate'] >= rate_range[0]) &
-    (df_filtered['token.exchange_rate'] <= rate_range[1])
-]
+# Date range is a slice of the time-sorted snapshot (a view); the remaining
+# filters only materialise the rows that survive them
+df_filtered = df_cleaned
+if len(selected_date) == 2:
+    df_filtered = time_slice(df_filtered, selected_date[0], selected_date[1])
+df_filtered = select_rows(df_filtered, {'token.symbol': selected_token, 'type': selected_type})
+df_filtered = df_filtered[df_filtered['token.exchange_rate'].between(rate_range[0], rate_range[1])]
 
 # === Summary Table ===
+prof.section("summary_table")
 st.subheader("📦 Top Token Holders and Distribution Summary")
 st.dataframe(df_summary.style.format({
     "Token Holding": "{:.6f}",
@@ -58,8 +76,10 @@ st.dataframe(df_summary.style.format({
 }))
 
 # === Task 3 Charts ===
+prof.section("address_charts")
 st.subheader("📈 Visual Breakdown by Address")
 col1, col2, col3 = st.columns(3)
+plt, mdates = charts()
 
 def labeled_barh(data, column, title, color):
     fig, ax = plt.subplots(figsize=(4, 2.5))  # Reduced figure size
@@ -86,40 +106,56 @@ with col3:
     st.table(df_summary[['address', 'Tokens Received']])  # Add data table below the graph
 
 # === Task 4 Charts ===
+prof.section("daily_volume")
 st.subheader("📉 Task 4: Blockchain Activity Trends")
 col4, col5 = st.columns(2)
 
 with col4:
-    st.markdown("##### 🔄 Daily Token Transfer Volume")
-    df_t4 = df_trend.copy()
-    if selected_token != "All":
-        df_t4 = df_t4[df_t4['token'] == selected_token]
+    df_t4 = select_rows(df_trend, {'token': selected_token})
     fig4, ax4 = plt.subplots(figsize=(5, 2.5))  # Reduced figure size
-    for token in df_t4['token'].unique():
-        token_df = df_t4[df_t4['token'] == token]
-        ax4.plot(token_df['date'], token_df['daily_volume'], marker='o', label=token)
-    ax4.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
+    # Volume is read from the precomputed buckets at the finest resolution that fits
+    # the selected date range into the chart width
+    chart_start, chart_end = (selected_date if len(selected_date) == 2 else (min_date, max_date))
+    volume_res = pick_resolution(chart_start, pd.Timestamp(chart_end) + pd.Timedelta(days=1), axis_pixels(ax4))
+    st.markdown(f"##### 🔄 {RESOLUTION_LABELS[volume_res]} Token Transfer Volume")
+    # Week/month buckets cut by the range ends are clipped to it (see buckets_in_range)
+    df_vol = buckets_in_range(snap["volume_buckets"], df_cleaned, volume_res, chart_start, chart_end)
+    df_vol = select_rows(df_vol, {'token': selected_token})
+    for token in df_vol['token'].unique():
+        token_df = df_vol[df_vol['token'] == token]
+        plot_downsampled(ax4, token_df['bucket'], token_df['volume'], label=token)
+    ax4.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d %H:%M' if volume_res == "hour" else '%Y-%m-%d'))
     ax4.tick_params(axis='x', labelrotation=45, labelsize=8)
     ax4.legend(fontsize=7)
     st.pyplot(fig4)
     st.table(df_t4[['date', 'daily_volume']])  # Add data table below the graph
 
+prof.section("cumulative_supply")
 with col5:
     st.markdown("##### 📈 Cumulative Token Supply")
-    df_sup = df_supply.copy()
-    if selected_token != "All":
-        df_sup = df_sup[df_sup['token.symbol'] == selected_token]
+    resolution = st.radio("Resolution", list(SUPPLY_RESOLUTIONS), index=0, horizontal=True)
+    supply_index = load_supply_index()
+    supply_tokens = list(supply_index.tokens) if selected_token == "All" else [selected_token]
     fig5, ax5 = plt.subplots(figsize=(5, 2.5))  # Reduced figure size
-    for token in df_sup['token.symbol'].unique():
-        token_df = df_sup[df_sup['token.symbol'] == token]
-        ax5.plot(token_df['date'], token_df['cumulative_supply'], marker='o', label=token)
+    # Each series is read straight off the index at the chosen resolution, no regrouping
+    freq = SUPPLY_RESOLUTIONS[resolution]
+    if freq == "auto":
+        freq = BUCKET_FREQS[pick_resolution(min_date, max_date, axis_pixels(ax5))]
+    sup_series = [supply_index.series(token, freq).assign(token=token) for token in supply_tokens]
+    for token_df in sup_series:
+        # "Exact" can be one point per event; LTTB keeps the shape at chart width
+        plot_downsampled(ax5, token_df['date'], token_df['cumulative_supply'], label=token_df['token'].iloc[0] if len(token_df) else None)
     ax5.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
     ax5.tick_params(axis='x', labelrotation=45, labelsize=8)
     ax5.legend(fontsize=7)
     st.pyplot(fig5)
-    st.table(df_sup[['date', 'cumulative_supply']])  # Add data table below the graph
+    daily = sup_series if freq == "D" else [supply_index.series(token, "D").assign(token=token) for token in supply_tokens]
+    df_sup = pd.concat(daily, ignore_index=True) if daily else pd.DataFrame(columns=['date', 'cumulative_supply', 'token'])
+    df_sup = df_sup.sort_values('date', ascending=False, kind='stable').head(SUPPLY_TABLE_ROWS)
+    st.dataframe(df_sup[['date', 'token', 'cumulative_supply']], hide_index=True)  # Add data table below the graph
 
 # === Top Tokens
+prof.section("top_tokens")
 st.subheader("🏆 Most Transferred Tokens")
 fig6, ax6 = plt.subplots(figsize=(5, 2.5))  # Reduced figure size
 bars = ax6.barh(df_top['token.symbol'], df_top['total_transferred'], color='orange')
@@ -131,6 +167,7 @@ st.pyplot(fig6)
 st.table(df_top[['token.symbol', 'total_transferred']])  # Add data table below the graph
 
 # === Raw Cleaned Table
+prof.section("raw_table")
 st.subheader("📄 Cleaned Token Transfer Records")
 st.dataframe(df_filtered.reset_index(drop=True))
 
@@ -139,27 +176,27 @@ st.dataframe(df_filtered.reset_index(drop=True))
 st.subheader("🚨 Additional Token Trend Insights")
 
 # 1. Weekly & Monthly Aggregates
-df_trend['week'] = pd.to_datetime(df_trend['date']).dt.to_period('W').dt.start_time
-df_trend['month'] = pd.to_datetime(df_trend['date']).dt.to_period('M').dt.start_time
-
+prof.section("weekly_volume")
+# Weekly/monthly buckets, spikes and activity counts are precomputed in the snapshot
 st.markdown("#### 📅 Weekly Aggregated Volume")
-weekly_vol = df_trend.groupby(['week', 'token'])['daily_volume'].sum().reset_index()
+weekly_vol = snap["weekly"]
 fig_week, ax_week = plt.subplots(figsize=(5, 2.5))  # Reduced figure size
 for token in weekly_vol['token'].unique():
     token_df = weekly_vol[weekly_vol['token'] == token]
-    ax_week.plot(token_df['week'], token_df['daily_volume'], marker='o', label=token)
+    plot_downsampled(ax_week, token_df['week'], token_df['daily_volume'], label=token)
 ax_week.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
 ax_week.tick_params(axis='x', labelrotation=45, labelsize=8)
 ax_week.legend(fontsize=7)
 st.pyplot(fig_week)
 st.table(weekly_vol[['week', 'daily_volume']])  # Add data table below the graph
 
+prof.section("monthly_volume")
 st.markdown("#### 🗓 Monthly Aggregated Volume")
-monthly_vol = df_trend.groupby(['month', 'token'])['daily_volume'].sum().reset_index()
+monthly_vol = snap["monthly"]
 fig_month, ax_month = plt.subplots(figsize=(5, 2.5))  # Reduced figure size
 for token in monthly_vol['token'].unique():
     token_df = monthly_vol[monthly_vol['token'] == token]
-    ax_month.plot(token_df['month'], token_df['daily_volume'], marker='o', label=token)
+    plot_downsampled(ax_month, token_df['month'], token_df['daily_volume'], label=token)
 ax_month.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m'))
 ax_month.tick_params(axis='x', labelrotation=45, labelsize=8)
 ax_month.legend(fontsize=7)
@@ -167,20 +204,15 @@ st.pyplot(fig_month)
 st.table(monthly_vol[['month', 'daily_volume']])  # Add data table below the graph
 
 # 2. Spike Detection in Minting/Burning
+prof.section("spikes")
 st.markdown("#### 🔍 Spike Detection in Minting & Burning")
-df_spike = df_cleaned.copy()
-df_spike['date'] = df_spike['timestamp'].dt.date
-mint_burn_spikes = df_spike[df_spike['type'].isin(['token_minting', 'token_burning'])]
-spikes_summary = mint_burn_spikes.groupby(['date', 'token.symbol', 'type'])['normalized_value'].sum().reset_index()
-pivot_spikes = spikes_summary.pivot(index=['date', 'token.symbol'], columns='type', values='normalized_value').fillna(0)
-pivot_spikes.reset_index(inplace=True)
+pivot_spikes = snap["spikes"]
 st.dataframe(pivot_spikes.sort_values(by=['date', 'token.symbol'], ascending=[False, True]).head(10))
 
 # 3. Most Actively Traded Tokens
+prof.section("most_active")
 st.markdown("#### 📊 Most Actively Traded Tokens by Count")
-most_active = df_cleaned[df_cleaned['type'] == 'token_transfer'].groupby('token.symbol')['transaction_hash'].count().reset_index()
-most_active.columns = ['token.symbol', 'transaction_count']
-most_active = most_active.sort_values(by='transaction_count', ascending=False).head(10)
+most_active = snap["active"]
 fig_active, ax_active = plt.subplots(figsize=(5, 2.5))  # Reduced figure size
 bars = ax_active.barh(most_active['token.symbol'], most_active['transaction_count'], color='purple')
 ax_active.set_xlabel("Transaction Count")
@@ -191,3 +223,5 @@ st.table(most_active[['token.symbol', 'transaction_count']])  # Add data table b
 
 st.markdown("---")
 st.markdown("Made with ❤️ by Qenehelo Matjama")
+
+prof.finish()
@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+
+# Per-token prefix-sum index over mint and burn events.
+# For every token we keep its event timestamps (sorted) and the running supply
+# after each event, so "supply of X as of T" is one binary search and
+# "net change between T1 and T2" is two searches and a subtraction. Any chart
+# resolution (hour, day, week, exact events) is read off the same index.
+
+SUPPLY_EVENT_SIGN = {'token_minting': 1.0, 'token_burning': -1.0}
+EVENT_COLUMNS = ['token.symbol', 'timestamp', 'delta', 'cumulative']
+
+
+def supply_events(df):
+    # Mint/burn rows of a cleaned frame as signed supply deltas
+    events = df[df['type'].isin(list(SUPPLY_EVENT_SIGN))]
+    return pd.DataFrame({
+        'token.symbol': events['token.symbol'].to_numpy(),
+        'timestamp': events['timestamp'].to_numpy(dtype='datetime64[ns]'),
+        'delta': events['normalized_value'].to_numpy(dtype=float) * events['type'].map(SUPPLY_EVENT_SIGN).to_numpy(dtype=float),
+    })
+
+
+def _as_ns(when):
+    return np.asarray(pd.to_datetime(when), dtype='datetime64[ns]').astype(np.int64)
+
+
+class SupplyIndex:
+    def __init__(self):
+        # token -> (timestamps as int64 ns, deltas, cumulative supply after each event)
+        self.tokens = {}
+
+    @classmethod
+    def from_frame(cls, df):
+        index = cls()
+        index.extend(df)
+        return index
+
+    @classmethod
+    def from_events(cls, events):
+        # Rebuild from a persisted to_frame() table; per-token slices stay views over it
+        index = cls()
+        if events.empty:
+            return index
+        symbols = events['token.symbol'].to_numpy(dtype=object)
+        ts = events['timestamp'].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+        delta = events['delta'].to_numpy()
+        cumulative = events['cumulative'].to_numpy()
+        starts = np.flatnonzero(np.r_[True, symbols[1:] != symbols[:-1]])
+        ends = np.r_[starts[1:], len(symbols)]
+        for lo, hi in zip(starts, ends):
+            index.tokens[symbols[lo]] = (ts[lo:hi], delta[lo:hi], cumulative[lo:hi])
+        return index
+
+    def extend(self, df):
+        # Add the mint/burn events of a new batch. Events after the last indexed one
+        # only extend the prefix sums; late events re-sum from their insertion point on.
+        events = supply_events(df)
+        for token, group in events.groupby('token.symbol', sort=False):
+            new_ts = group['timestamp'].to_numpy().astype(np.int64)
+            new_delta = group['delta'].to_numpy()
+            order = np.argsort(new_ts, kind='stable')
+            new_ts, new_delta = new_ts[order], new_delta[order]
+
+            if token not in self.tokens:
+                self.tokens[token] = (new_ts, new_delta, np.cumsum(new_delta))
+                continue
+
+            ts, delta, cumulative = self.tokens[token]
+            if new_ts[0] >= ts[-1]:
+                appended = cumulative[-1] + np.cumsum(new_delta)
+                self.tokens[token] = (np.r_[ts, new_ts], np.r_[delta, new_delta], np.r_[cumulative, appended])
+                continue
+
+            # Out-of-order batch: keep the untouched prefix, re-sum the rest
+            split = np.searchsorted(ts, new_ts[0], side='right')
+            tail_ts = np.r_[ts[split:], new_ts]
+            tail_delta = np.r_[delta[split:], new_delta]
+            tail_order = np.argsort(tail_ts, kind='stable')
+            base = cumulative[split - 1] if split else 0.0
+            tail_cumulative = base + np.cumsum(tail_delta[tail_order])
+            self.tokens[token] = (np.r_[ts[:split], tail_ts[tail_order]],
+                                  np.r_[delta[:split], tail_delta[tail_order]],
+                                  np.r_[cumulative[:split], tail_cumulative])
+
+    def supply_as_of(self, token, when):
+        # Supply including every event at or before `when` (scalar or array of timestamps)
+        if token not in self.tokens:
+            return np.zeros(np.shape(when)) if np.ndim(when) else 0.0
+        ts, _, cumulative = self.tokens[token]
+        pos = np.searchsorted(ts, _as_ns(when), side='right')
+        values = np.where(pos > 0, cumulative[np.maximum(pos - 1, 0)], 0.0)
+        return values if np.ndim(values) else float(values)
+
+    def net_change(self, token, start, end):
+        # Net minted minus burned in (start, end]
+        return self.supply_as_of(token, end) - self.supply_as_of(token, start)
+
+    def series(self, token, freq="D", start=None, end=None):
+        # Supply at the end of each bucket; freq=None returns every event (exact resolution)
+        if token not in self.tokens:
+            return pd.DataFrame(columns=['date', 'cumulative_supply'])
+        ts, _, cumulative = self.tokens[token]
+        lo = ts[0] if start is None else _as_ns(start)
+        hi = ts[-1] if end is None else _as_ns(end)
+        if freq is None:
+            a, b = np.searchsorted(ts, lo, side='left'), np.searchsorted(ts, hi, side='right')
+            return pd.DataFrame({'date': pd.to_datetime(ts[a:b]), 'cumulative_supply': cumulative[a:b]})
+        periods = pd.period_range(pd.Timestamp(lo), pd.Timestamp(hi), freq=freq)
+        return pd.DataFrame({'date': periods.start_time,
+                             'cumulative_supply': self.supply_as_of(token, periods.end_time)})
+
+    def to_frame(self):
+        frames = [pd.DataFrame({'token.symbol': token, 'timestamp': pd.to_datetime(ts),
+                                'delta': delta, 'cumulative': cumulative})
+                  for token, (ts, delta, cumulative) in self.tokens.items()]
+        if not frames:
+            return pd.DataFrame(columns=EVENT_COLUMNS)
+        return pd.concat(frames, ignore_index=True)[EVENT_COLUMNS]
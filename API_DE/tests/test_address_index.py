@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+from address_index import AddressIndex
+from pipeline import analyze_holdings
+
+
+def cleaned():
+    rows = [
+        # type, token, from, to, value
+        ("token_minting", "AAA", "0x0", "0xAlice", 100.0),
+        ("token_transfer", "AAA", "0xalice", "0xBob", 30.0),
+        ("token_transfer", "BBB", "0xBob", "0xALICE", 7.0),
+        ("token_burning", "AAA", "0xAlice", "0x0", 10.0),
+        ("token_transfer", "AAA", "0xBob", "0xBob", 5.0),  # self-transfer nets to zero
+    ]
+    df = pd.DataFrame(rows, columns=["type", "token.symbol", "from.hash", "to.hash", "normalized_value"])
+    df["timestamp"] = pd.date_range("2025-01-01", periods=len(df), freq="h")
+    return df
+
+
+def test_balances_per_token_ignore_address_case():
+    index = AddressIndex.from_frame(cleaned())
+    balances = {b["token"]: b for b in index.balances("0xALICE")["balances"]}
+    assert balances["AAA"]["balance"] == 100.0 - 30.0 - 10.0
+    assert (balances["AAA"]["minted"], balances["AAA"]["sent"], balances["AAA"]["burned"]) == (100.0, 30.0, 10.0)
+    assert balances["BBB"]["received"] == 7.0 and balances["BBB"]["balance"] == 7.0
+    bob = {b["token"]: b["balance"] for b in index.balances("0xbob")["balances"]}
+    assert bob == {"AAA": 30.0, "BBB": -7.0}
+    assert index.balances("0xnobody")["balances"] == []
+
+
+def test_balances_match_analyze_holdings():
+    rng = np.random.default_rng(0)
+    n = 500
+    df = pd.DataFrame({
+        "type": rng.choice(["token_minting", "token_burning", "token_transfer"], n),
+        "token.symbol": rng.choice(["AAA", "BBB"], n),
+        "from.hash": rng.choice([f"0xa{i}" for i in range(8)], n),
+        "to.hash": rng.choice([f"0xa{i}" for i in range(8)], n),
+        "normalized_value": rng.random(n) * 10,
+        "timestamp": pd.Timestamp("2025-01-01") + pd.to_timedelta(np.arange(n), unit="min"),
+    })
+    index = AddressIndex.from_frame(df)
+    holdings = analyze_holdings(df).dropna(subset=["Token Holding"])
+    for address, expected in zip(holdings["address"], holdings["Token Holding"]):
+        total = sum(b["balance"] for b in index.balances(address)["balances"])
+        assert np.isclose(total, expected)
@@ -0,0 +1,46 @@
+import pandas as pd
+
+import dedup
+from dedup import DedupIndex
+
+
+def transfers(start, stop):
+    return pd.DataFrame({"transaction_hash": [f"0x{i:06x}" for i in range(start, stop)],
+                         "log_index": [i % 3 for i in range(start, stop)]})
+
+
+def ingest(path, df):
+    index = DedupIndex(path)
+    new_rows, fingerprints, stats = index.filter_new(df)
+    index.add(fingerprints)
+    return new_rows, stats
+
+
+def test_reopened_index_filters_earlier_batches(tmp_path):
+    path = str(tmp_path / "dedup")
+    ingest(path, transfers(0, 100))
+    new_rows, stats = ingest(path, transfers(50, 150))
+    assert new_rows["transaction_hash"].tolist() == transfers(100, 150)["transaction_hash"].tolist()
+    assert stats["historical_duplicates"] == 50
+    assert DedupIndex(path).meta["count"] == 150
+
+
+def test_repeats_within_a_batch_are_dropped(tmp_path):
+    batch = pd.concat([transfers(0, 10), transfers(5, 10)], ignore_index=True)
+    new_rows, stats = ingest(str(tmp_path / "dedup"), batch)
+    assert len(new_rows) == 10
+    assert stats["in_batch_duplicates"] == 5
+
+
+def test_compaction_keeps_every_fingerprint(tmp_path):
+    path = str(tmp_path / "dedup")
+    for batch in range(3 * dedup.TIER_FANOUT):
+        ingest(path, transfers(batch * 20, (batch + 1) * 20))
+    index = DedupIndex(path)
+    assert len(index.runs) < 3 * dedup.TIER_FANOUT
+    # Only the runs meta.json refers to are left on disk
+    assert sorted(f for f in (tmp_path / "dedup").iterdir() if f.name.startswith("run_")) == \
+        sorted(tmp_path / "dedup" / name for name in index.meta["runs"])
+    fingerprints = dedup.transfer_fingerprints(transfers(0, 3 * dedup.TIER_FANOUT * 20))
+    assert index._exact_contains(fingerprints).all()
+    assert not index._exact_contains(dedup.transfer_fingerprints(transfers(1000, 1010))).any()
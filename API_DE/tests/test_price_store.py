@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+
+from price_store import PriceStore
+
+
+def store():
+    return PriceStore.from_frame(pd.DataFrame({
+        "token.symbol": ["AAA", "AAA", "BBB"],
+        "timestamp": pd.to_datetime(["2025-01-10", "2025-01-20", "2025-01-15"]),
+        "rate": [1.0, 2.0, 5.0],
+    }))
+
+
+def test_rates_for_backward_with_forward_fallback():
+    transfers = pd.DataFrame({
+        "token.symbol": ["AAA", "AAA", "AAA", "AAA", "BBB", "CCC"],
+        "timestamp": pd.to_datetime(["2025-01-25", "2025-01-01", "2025-01-10", "2025-01-15",
+                                     "2025-01-01", "2025-01-15"]),
+    })
+    rates = store().rates_for(transfers)
+    # Last rate at or before the transfer; the earliest rate for transfers before any
+    # point; NaN for a token the store has never seen. Aligned with the input rows.
+    np.testing.assert_array_equal(rates, [2.0, 1.0, 1.0, 1.0, 5.0, np.nan])
+
+
+def test_add_counts_new_and_corrected_points():
+    prices = store()
+    corrected = pd.DataFrame({"token.symbol": ["AAA", "AAA"],
+                              "timestamp": pd.to_datetime(["2025-01-10", "2025-01-30"]),
+                              "rate": [1.5, 3.0]})
+    assert prices.add(corrected) == 2
+    assert len(prices) == 4
+    assert prices.add(corrected) == 0
+    assert prices.rates_for(pd.DataFrame({"token.symbol": ["AAA"], "timestamp": pd.to_datetime(["2025-01-12"])}))[0] == 1.5
@@ -0,0 +1,48 @@
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+
+from report import workbook_sheet_names, write_report
+
+
+def sheets(value=1.0):
+    return {"task2_metrics_table": pd.DataFrame({"Metric": ["a", "b"], "Value": [value, 2.0]}),
+            "Raw_fetched_records": pd.DataFrame({"transaction_hash": [f"0x{i}" for i in range(5)]})}
+
+
+def existing_workbook(path):
+    workbook = Workbook()
+    workbook.active.title = "Sheet1"
+    workbook.active.append(["note", "kept"])
+    stale = workbook.create_sheet("Total fetched records")
+    stale.append(["transaction_hash"])
+    stale.append(["0xold"])
+    workbook.save(path)
+
+
+def test_unchanged_report_is_not_rewritten(tmp_path):
+    path = str(tmp_path / "report.xlsx")
+    assert write_report(sheets(), path)["written"]
+    again = write_report(sheets(), path)
+    assert not again["written"]
+    assert again["unchanged"] == ["task2_metrics_table", "Raw_fetched_records"]
+    changed = write_report(sheets(value=5.0), path)
+    assert changed["written"] and changed["changed"] == ["task2_metrics_table"]
+
+
+def test_foreign_sheets_carried_over_and_superseded_dropped(tmp_path):
+    path = str(tmp_path / "report.xlsx")
+    existing_workbook(path)
+    result = write_report(sheets(), path)
+    assert result["carried_over"] == ["Sheet1"]
+    assert result["dropped"] == ["Total fetched records"]
+    assert workbook_sheet_names(path) == ["Sheet1", "task2_metrics_table", "Raw_fetched_records"]
+    workbook = load_workbook(path, read_only=True)
+    assert list(workbook["Sheet1"].iter_rows(values_only=True)) == [("note", "kept")]
+
+
+def test_optional_sheet_row_cap_and_exclusion(tmp_path):
+    path = str(tmp_path / "report.xlsx")
+    write_report(sheets(), path, optional_row_cap=2)
+    assert load_workbook(path, read_only=True)["Raw_fetched_records"].max_row == 3  # header + 2 rows
+    write_report(sheets(), path, include_optional=False, keep_other_sheets=False)
+    assert workbook_sheet_names(path) == ["task2_metrics_table"]
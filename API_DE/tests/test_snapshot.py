@@ -0,0 +1,40 @@
+import os
+
+import pandas as pd
+
+import snapshot
+from snapshot import current_generation, publish_frames, read_mapped, time_slice
+
+
+def published(snapshot_dir, name):
+    return read_mapped(os.path.join(current_generation(snapshot_dir), f"{name}.arrow"))
+
+
+def test_publish_swaps_whole_generations(tmp_path):
+    snapshot_dir = str(tmp_path / "snapshot")
+    first = publish_frames({"cleaned": pd.DataFrame({"v": [1.0]}), "top": pd.DataFrame({"v": [1.0]})}, snapshot_dir)
+    publish_frames({"cleaned": pd.DataFrame({"v": [2.0]}), "top": pd.DataFrame({"v": [2.0]})}, snapshot_dir)
+    assert published(snapshot_dir, "cleaned")["v"].tolist() == [2.0]
+    assert published(snapshot_dir, "top")["v"].tolist() == [2.0]
+    # The previous generation stays for readers still mapping it, older ones are pruned
+    publish_frames({"cleaned": pd.DataFrame({"v": [3.0]})}, snapshot_dir)
+    generations = [e for e in os.listdir(snapshot_dir) if e.startswith("gen-")]
+    assert len(generations) == snapshot.KEEP_GENERATIONS
+    assert os.path.basename(first) not in generations
+
+
+def test_strings_stay_arrow_backed(tmp_path):
+    path = str(tmp_path / "frame.arrow")
+    snapshot.write_arrow(pd.DataFrame({"token.symbol": ["AAA", None, "BBB"], "value": [1.0, None, 3.0]}), path)
+    df = read_mapped(path)
+    assert df["token.symbol"].dtype == snapshot.MAPPED_STRING_DTYPE
+    assert df["token.symbol"].isna().tolist() == [False, True, False]
+    assert df["value"].isna().tolist() == [False, True, False]
+
+
+def test_time_slice_includes_whole_end_day():
+    df = pd.DataFrame({"timestamp": pd.to_datetime(["2025-01-01 10:00", "2025-01-02 00:00", "2025-01-02 23:59",
+                                                    "2025-01-03 00:00"]), "v": range(4)})
+    assert time_slice(df, "2025-01-02", "2025-01-02")["v"].tolist() == [1, 2]
+    assert time_slice(df, "2024-12-01", "2025-01-01")["v"].tolist() == [0]
+    assert time_slice(df, "2025-02-01", "2025-03-01").empty
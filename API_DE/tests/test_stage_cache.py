@@ -0,0 +1,101 @@
+import sys
+
+import pandas as pd
+
+from instrumentation import PipelineMetrics
+from stage_cache import Stage, StageCache, run_stages
+
+
+SCALE = 3
+
+
+def scale(df):
+    return df.assign(value=df['value'] * SCALE)
+
+
+def double_v1(df):
+    return df.assign(value=df['value'] * 2)
+
+
+def double_v2(df):
+    # Same name and inputs as double_v1, different code
+    return df.assign(value=df['value'] + df['value'])
+
+
+def copy_frame(df):
+    return df.copy()
+
+
+def run(fn, frame, cache):
+    artifacts = {"input": frame}
+    report = run_stages([Stage("double", fn, ["input"], ["output"])], artifacts, PipelineMetrics(), cache)
+    return report[0]["cache"], artifacts["output"]
+
+
+def test_cache_hit_for_same_code_and_inputs(tmp_path):
+    cache = StageCache(str(tmp_path))
+    frame = pd.DataFrame({"value": [1, 2, 3]})
+    assert run(double_v1, frame, cache)[0] == "miss"
+    status, output = run(double_v1, frame.copy(), cache)
+    assert status == "hit"
+    assert output["value"].tolist() == [2, 4, 6]
+
+
+def test_cache_invalidates_on_input_change(tmp_path):
+    cache = StageCache(str(tmp_path))
+    run(double_v1, pd.DataFrame({"value": [1, 2, 3]}), cache)
+    status, output = run(double_v1, pd.DataFrame({"value": [1, 2, 4]}), cache)
+    assert status == "miss"
+    assert output["value"].tolist() == [2, 4, 8]
+
+
+def test_cache_key_includes_column_names(tmp_path):
+    cache = StageCache(str(tmp_path))
+    run(copy_frame, pd.DataFrame({"value": [1, 2, 3]}), cache)
+    status, output = run(copy_frame, pd.DataFrame({"amount": [1, 2, 3]}), cache)
+    assert status == "miss"
+    assert list(output.columns) == ["amount"]
+
+
+def test_cache_invalidates_on_code_change(tmp_path):
+    cache = StageCache(str(tmp_path))
+    frame = pd.DataFrame({"value": [1, 2, 3]})
+    run(double_v1, frame, cache)
+    assert run(double_v2, frame, cache)[0] == "miss"
+    assert run(double_v1, frame, cache)[0] == "hit"
+
+
+def test_uncached_stage_always_runs(tmp_path):
+    calls = []
+
+    def side_effect(df):
+        calls.append(len(df))
+        return df
+
+    cache = StageCache(str(tmp_path))
+    for _ in range(2):
+        artifacts = {"input": pd.DataFrame({"value": [1]})}
+        report = run_stages([Stage("write", side_effect, ["input"], ["output"], cache=False)],
+                            artifacts, PipelineMetrics(), cache)
+        assert report[0]["cache"] == "uncached"
+    assert calls == [1, 1]
+
+
+def test_cache_invalidates_on_constant_change(tmp_path, monkeypatch):
+    cache = StageCache(str(tmp_path))
+    frame = pd.DataFrame({"value": [1, 2, 3]})
+    assert run(scale, frame, cache)[0] == "miss"
+    assert run(scale, frame, cache)[0] == "hit"
+    monkeypatch.setattr(sys.modules[__name__], "SCALE", 4)
+    status, output = run(scale, frame, cache)
+    assert status == "miss"
+    assert output["value"].tolist() == [4, 8, 12]
+
+
+def test_rows_in_counts_only_row_inputs(tmp_path):
+    metrics = PipelineMetrics()
+    artifacts = {"batch": pd.DataFrame({"value": range(40)}), "prices": pd.DataFrame({"rate": range(4)})}
+    run_stages([Stage("process", lambda batch, prices: batch.copy(), ["batch", "prices"], ["cleaned"],
+                      row_inputs=["batch"])], artifacts, metrics, StageCache(str(tmp_path)))
+    record = next(s for s in metrics.stages if s["stage"] == "process")
+    assert (record["rows_in"], record["rows_out"]) == (40, 40)
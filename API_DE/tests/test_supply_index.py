@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+
+from supply_index import SupplyIndex
+
+
+def cleaned(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "token.symbol": rng.choice(["AAA", "BBB"], n),
+        "timestamp": pd.Timestamp("2025-01-01") + pd.to_timedelta(rng.integers(0, 90 * 24, n), unit="h"),
+        "type": rng.choice(["token_minting", "token_burning", "token_transfer"], n),
+        "normalized_value": rng.random(n) * 100,
+    })
+
+
+def by_token(index):
+    return index.to_frame().sort_values(["token.symbol", "timestamp"], kind="stable").reset_index(drop=True)
+
+
+def supply_at_each_timestamp(index):
+    # Events sharing a timestamp may be summed in any order; the supply after them may not differ
+    return index.to_frame().groupby(["token.symbol", "timestamp"])["cumulative"].last()
+
+
+def test_extend_out_of_order_matches_from_frame():
+    df = cleaned(600)
+    # Batches arrive with overlapping and earlier time ranges than what is indexed
+    batches = [df.iloc[200:400], df.iloc[:200].sort_values("timestamp", ascending=False), df.iloc[400:]]
+    index = SupplyIndex()
+    for batch in batches:
+        index.extend(batch)
+    expected = SupplyIndex.from_frame(df)
+    pd.testing.assert_frame_equal(by_token(index)[["token.symbol", "timestamp"]],
+                                  by_token(expected)[["token.symbol", "timestamp"]])
+    pd.testing.assert_series_equal(supply_at_each_timestamp(index), supply_at_each_timestamp(expected))
+    for token in ["AAA", "BBB"]:
+        when = pd.Timestamp("2025-02-15")
+        assert np.isclose(index.supply_as_of(token, when), expected.supply_as_of(token, when))
+
+
+def test_from_events_round_trip():
+    index = SupplyIndex.from_frame(cleaned(300, seed=1))
+    restored = SupplyIndex.from_events(index.to_frame())
+    pd.testing.assert_frame_equal(by_token(restored), by_token(index))
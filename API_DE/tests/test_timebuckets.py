@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+
+from timebuckets import buckets_in_range, lttb, volume_buckets
+
+
+def test_lttb_keeps_ends_and_spikes():
+    x = np.arange(10_000)
+    y = np.sin(x / 500.0)
+    y[6_123] = 50.0
+    keep = lttb(x, y, 200)
+    assert len(keep) == 200
+    assert keep[0] == 0 and keep[-1] == len(x) - 1
+    assert np.all(np.diff(keep) > 0)
+    assert 6_123 in keep
+
+
+def test_lttb_short_series_untouched():
+    assert lttb(np.arange(5), np.ones(5), 10).tolist() == [0, 1, 2, 3, 4]
+    x = pd.date_range("2025-01-01", periods=1000, freq="h")
+    assert len(lttb(x, np.random.default_rng(0).random(1000), 50)) == 50
+
+
+def transfers(n=5000):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "timestamp": pd.Timestamp("2023-11-01") + pd.to_timedelta(np.sort(rng.integers(0, 600 * 86400, n)), unit="s"),
+        "token.symbol": rng.choice(["AAA", "BBB"], n),
+        "normalized_value": rng.random(n),
+    })
+
+
+def test_buckets_in_range_clips_partial_edge_buckets():
+    df = transfers()
+    buckets = volume_buckets(df)
+    start, end = "2024-01-04", "2025-03-15"  # neither end on a week or month boundary
+    in_range = (df["timestamp"] >= start) & (df["timestamp"] < pd.Timestamp(end) + pd.Timedelta(days=1))
+    for resolution in ["hour", "day", "week", "month"]:
+        chart = buckets_in_range(buckets, df, resolution, start, end)
+        assert np.isclose(chart["volume"].sum(), df.loc[in_range, "normalized_value"].sum()), resolution
+        assert chart["transfers"].sum() == in_range.sum()
+        assert chart["bucket"].is_monotonic_increasing
+    weeks = buckets_in_range(buckets, df, "week", start, end)
+    # The first bucket is the (Monday) week containing the start day
+    assert weeks["bucket"].iloc[0] == pd.Timestamp("2024-01-01")
@@ -0,0 +1,134 @@
+import numpy as np
+import pandas as pd
+
+# Multi-resolution volume buckets and point downsampling for the trend charts.
+# Hour, day, week and month totals are computed once from the cleaned records;
+# a chart picks the finest resolution whose bucket count over the visible range
+# fits its width in pixels, and any series that is still longer than that is
+# reduced with Largest-Triangle-Three-Buckets (LTTB), which keeps peaks and dips.
+# Render cost then follows the chart width, not the length of the history.
+
+# resolution -> bucket length in seconds (month is approximate), finest first
+BUCKET_SECONDS = {"hour": 3600, "day": 86400, "week": 7 * 86400, "month": 30.44 * 86400}
+# resolution -> pandas frequency (for SupplyIndex.series / period_range)
+BUCKET_FREQS = {"hour": "h", "day": "D", "week": "W", "month": "M"}
+BUCKET_COLUMNS = ['resolution', 'bucket', 'token', 'volume', 'transfers']
+# Above this many points per series the 'o' markers are dropped, they only add draw calls
+MARKER_LIMIT = 60
+
+
+def bucket_start(timestamps, resolution):
+    ts = pd.to_datetime(timestamps)
+    if resolution in ("hour", "day"):
+        return ts.dt.floor(BUCKET_FREQS[resolution])
+    # Weeks start on Monday, as in the weekly aggregate
+    return ts.dt.to_period(BUCKET_FREQS[resolution]).dt.start_time
+
+
+def volume_buckets(df):
+    # Long table: one row per (resolution, bucket start, token), sorted by
+    # resolution and then bucket, so one resolution is a time-sorted slice
+    frames = []
+    for resolution in BUCKET_SECONDS:
+        key = bucket_start(df['timestamp'], resolution).rename('bucket')
+        grouped = df.groupby([key, df['token.symbol'].rename('token')])['normalized_value']
+        frame = grouped.agg(volume='sum', transfers='count').reset_index()
+        frame.insert(0, 'resolution', resolution)
+        frames.append(frame.sort_values(['bucket', 'token'], kind='stable'))
+    if not frames:
+        return pd.DataFrame(columns=BUCKET_COLUMNS)
+    return pd.concat(frames, ignore_index=True)[BUCKET_COLUMNS]
+
+
+def bucket_end(bucket, resolution):
+    # Start of the next bucket
+    return (pd.Timestamp(bucket).to_period(BUCKET_FREQS[resolution]) + 1).start_time
+
+
+def buckets_in_range(buckets, cleaned, resolution, start, end):
+    # One resolution's buckets over the days [start, end]. Week and month buckets the
+    # range only partly covers are re-summed from the (time-sorted) cleaned rows
+    # inside the range, so edge buckets are clipped rather than dropped or counted whole.
+    lo_time, hi_time = pd.Timestamp(start), pd.Timestamp(end) + pd.Timedelta(days=1)
+    first = bucket_start(pd.Series([lo_time]), resolution).iloc[0]
+    last = bucket_start(pd.Series([hi_time - pd.Timedelta(1, "ns")]), resolution).iloc[0]
+    rows = buckets[(buckets['resolution'] == resolution).to_numpy(dtype=bool)]
+    bucket_times = rows['bucket'].to_numpy()
+    rows = rows.iloc[np.searchsorted(bucket_times, np.datetime64(first), side="left"):
+                     np.searchsorted(bucket_times, np.datetime64(last), side="right")]
+
+    edges = {first: (lo_time, min(bucket_end(first, resolution), hi_time))}
+    edges[last] = (max(last, lo_time), hi_time)
+    partial = {b: span for b, span in edges.items() if span != (b, bucket_end(b, resolution))}
+    if not partial:
+        return rows
+    times = cleaned['timestamp'].to_numpy()
+    clipped = []
+    for bucket, (lo, hi) in partial.items():
+        part = cleaned.iloc[np.searchsorted(times, np.datetime64(lo), side="left"):
+                            np.searchsorted(times, np.datetime64(hi), side="left")]
+        grouped = part.groupby(part['token.symbol'].rename('token'))['normalized_value']
+        frame = grouped.agg(volume='sum', transfers='count').reset_index()
+        frame.insert(0, 'bucket', bucket)
+        frame.insert(0, 'resolution', resolution)
+        clipped.append(frame)
+    kept = rows[~rows['bucket'].isin(list(partial)).to_numpy(dtype=bool)]
+    merged = pd.concat([kept, *clipped], ignore_index=True)[BUCKET_COLUMNS]
+    return merged.sort_values(['bucket', 'token'], kind='stable').reset_index(drop=True)
+
+
+def pick_resolution(start, end, max_points):
+    # Finest resolution that puts at most max_points buckets across [start, end]
+    span = (pd.Timestamp(end) - pd.Timestamp(start)).total_seconds()
+    for resolution, seconds in BUCKET_SECONDS.items():
+        if span / seconds + 1 <= max_points:
+            return resolution
+    return "month"
+
+
+def axis_pixels(ax):
+    # Width of the plotting area in pixels at the figure's dpi
+    fig = ax.figure
+    return max(int(fig.get_figwidth() * fig.dpi * ax.get_position().width), 3)
+
+
+def _as_numbers(x):
+    values = np.asarray(x)
+    if values.dtype.kind in "iuf":
+        return values.astype(float)
+    return pd.to_datetime(pd.Index(values)).asi8.astype(float)
+
+
+def lttb(x, y, threshold):
+    # Indices of the points kept by Largest-Triangle-Three-Buckets. The first and
+    # last points stay; each bucket in between keeps the point forming the largest
+    # triangle with the previously kept point and the average of the next bucket.
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x, y = _as_numbers(x), np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_x, next_y = x[hi:edges[i + 2]].mean(), y[hi:edges[i + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        area = np.abs((x[a] - next_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (next_y - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def plot_downsampled(ax, x, y, max_points=None, **kwargs):
+    # ax.plot for one series, reduced to at most max_points (default: axis width in pixels)
+    max_points = max_points or axis_pixels(ax)
+    x, y = np.asarray(x), np.asarray(y)
+    if len(x) > max_points:
+        keep = lttb(x, y, max_points)
+        x, y = x[keep], y[keep]
+    kwargs.setdefault('marker', 'o' if len(x) <= MARKER_LIMIT else None)
+    return ax.plot(x, y, **kwargs)
@@ -0,0 +1,117 @@
+import argparse
+import os
+import sys
+import time
+import urllib.request
+from urllib.error import URLError
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from websockets.sync.client import connect
+
+from snapshot import ensure_snapshot
+
+# Start-up warm-up in two steps.
+# --prepare runs before `streamlit run`: it publishes the snapshot if the workbook
+# is newer (the slow openpyxl parse) and builds matplotlib's font cache, so no
+# visitor's request pays for either.
+# Without it, it waits for the running server and requests one page headlessly.
+# The mapped snapshot, supply index and matplotlib import are cached inside the
+# server process (st.cache_resource), so only a script run *in that process*
+# fills them. It opens the same websocket a browser does, asks for one run and
+# times it until script_finished: that is the first-page latency checked against
+# the budget. An overrun is reported, it never stops the server from serving.
+# Visitors arriving during that first run are served alongside it.
+#
+#   python warmup.py --prepare; python warmup.py & streamlit run streamlit_app_final.py
+
+EXCEL_PATH = "DE_Assesment_Results.xlsx"  # relative to the directory streamlit runs in, as in the apps
+DEFAULT_URL = "http://localhost:8501"
+STARTUP_BUDGET_SECONDS = float(os.environ.get("STARTUP_BUDGET_SECONDS", 10.0))
+SERVER_WAIT_SECONDS = 120
+
+
+def prepare(excel_path=EXCEL_PATH):
+    # Work that does not need the server process; returns seconds per step
+    timings = {}
+    start = time.perf_counter()
+    ensure_snapshot(excel_path)
+    timings["snapshot"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    import matplotlib
+    matplotlib.use("Agg")
+    from matplotlib import font_manager
+    font_manager.findfont("DejaVu Sans")  # first use scans the system fonts and writes the cache
+    timings["font cache"] = time.perf_counter() - start
+    return timings
+
+
+def wait_for_server(url, timeout=SERVER_WAIT_SECONDS):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"{url}/_stcore/health", timeout=2) as response:
+                if response.status == 200:
+                    return True
+        except (URLError, OSError):
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def first_page(url, query_string="", timeout=SERVER_WAIT_SECONDS):
+    # One full script run in the server; returns (seconds, script_finished status name)
+    stream_url = url.replace("http", "ws", 1) + "/_stcore/stream"
+    request = BackMsg()
+    request.rerun_script.query_string = query_string
+    request.rerun_script.page_script_hash = ""
+    start = time.perf_counter()
+    with connect(stream_url, subprotocols=["streamlit"], max_size=None, open_timeout=timeout) as ws:
+        ws.send(request.SerializeToString())
+        while True:
+            msg = ForwardMsg()
+            msg.ParseFromString(ws.recv(timeout=timeout))
+            if msg.WhichOneof("type") == "script_finished":
+                status = ForwardMsg.ScriptFinishedStatus.Name(msg.script_finished)
+                return time.perf_counter() - start, status
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm the running dashboard with one headless page view.")
+    parser.add_argument("--prepare", action="store_true",
+                        help="Publish the snapshot and build the font cache, then exit (run before streamlit)")
+    parser.add_argument("--excel", default=EXCEL_PATH, help="Workbook the dashboards read (with --prepare)")
+    parser.add_argument("--url", default=DEFAULT_URL, help="Base URL of the Streamlit server")
+    parser.add_argument("--budget", type=float, default=STARTUP_BUDGET_SECONDS,
+                        help="Report when the first page takes longer than this many seconds")
+    parser.add_argument("--wait", type=float, default=SERVER_WAIT_SECONDS,
+                        help="Seconds to wait for the server to come up")
+    args = parser.parse_args()
+
+    if args.prepare:
+        try:
+            timings = prepare(args.excel)
+        except (OSError, ValueError) as e:
+            # The dashboard still starts and builds the snapshot on its first run
+            print(f"Warm-up prepare failed: {e}", file=sys.stderr)
+            return 1
+        for step, seconds in timings.items():
+            print(f"{step:<11}{seconds:8.3f}s")
+        return 0
+
+    if not wait_for_server(args.url, args.wait):
+        print(f"Warm-up skipped: no Streamlit server at {args.url} after {args.wait:.0f}s", file=sys.stderr)
+        return 1
+
+    cold, status = first_page(args.url)
+    warm, _ = first_page(args.url)
+    print(f"first page {cold:8.3f}s ({status})")
+    print(f"next page  {warm:8.3f}s")
+    if cold > args.budget:
+        print(f"Startup budget exceeded: first page took {cold:.1f}s (budget {args.budget:.1f}s)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())